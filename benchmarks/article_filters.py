@@ -0,0 +1,67 @@
+"""
+Query plans and latency of the filtered ``/articles/`` pages on a seeded
+dataset, failing if a filter falls back to a full table scan.
+
+    python benchmarks/article_filters.py [--articles 1000000] [--repeat 5]
+"""
+import argparse
+import re
+import timeit
+
+from common import seed, setup, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test import RequestFactory
+
+    from techtest.articles.models import Article
+    from techtest.articles.schemas import ArticleFilterSchema, ArticleSchema
+    from techtest.authors.models import Author
+    from techtest.pagination import paginate
+    from techtest.regions.models import Region
+    from techtest.schemas import get_schema
+    from techtest.utils import optimize_queryset
+
+    with test_database():
+        seed(authors=args.articles // 10, regions=100, articles=args.articles)
+        # Middling rows: counts per author and region are skewed
+        author = Author.objects.order_by("pk")[Author.objects.count() // 2]
+        region = Region.objects.order_by("pk")[Region.objects.count() // 2]
+        title = Article.objects.order_by("pk")[Article.objects.count() // 2].title
+        cases = {
+            "author_id": {"author_id": author.id},
+            "region": {"region": region.code},
+            "title__startswith": {"title__startswith": title[:6]},
+            "combined": {"author_id": author.id, "region": region.code},
+        }
+        schema = get_schema(ArticleSchema)
+        for name, params in cases.items():
+            request = RequestFactory().get("/articles/", params)
+            filters = ArticleFilterSchema().load(params)
+            queryset = optimize_queryset(Article.objects.filter(**filters), schema)
+            plan = queryset.order_by("pk")[:100].explain()
+            # Any line reading a table without an index is a full scan
+            full_scans = [
+                line
+                for line in plan.splitlines()
+                if re.search(r"\bSCAN\b", line) and "INDEX" not in line
+            ]
+            best = min(
+                timeit.repeat(
+                    lambda: paginate(request, queryset), number=1, repeat=args.repeat
+                )
+            )
+            print("%-18s %10.2f ms" % (name, best * 1000))
+            print("    " + plan.replace("\n", "\n    "))
+            assert not full_scans, "%s does a full scan: %s" % (name, full_scans)
+
+
+if __name__ == "__main__":
+    main()
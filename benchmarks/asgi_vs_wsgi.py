@@ -0,0 +1,126 @@
+"""
+Concurrent-request throughput and latency of the read endpoints served by
+the sync views under WSGI, the same views under ASGI (through Django's
+sync_to_async bridge) and the async views under ASGI.
+
+    python benchmarks/asgi_vs_wsgi.py [--requests 2000] [--concurrency 50]
+                                      [--articles 1000] [--no-cache]
+
+Requests go through Django's in-process test clients, so the numbers leave
+out the HTTP server and measure the framework and application only.
+"""
+import argparse
+import asyncio
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import percentile, seed, setup, test_database
+
+
+def report(name, elapsed, latencies):
+    print(
+        "%-18s %10.0f req/s %10.2f ms p50 %10.2f ms p99"
+        % (
+            name,
+            len(latencies) / elapsed,
+            percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.99) * 1000,
+        )
+    )
+
+
+def use_async_views(enabled):
+    from django.conf import settings
+    from django.urls import clear_url_caches
+
+    import techtest.urls
+
+    settings.ASYNC_VIEWS = (
+        [getattr(pattern, "name", None) for pattern in techtest.urls.urlpatterns]
+        if enabled
+        else []
+    )
+    importlib.reload(techtest.urls)
+    clear_url_caches()
+
+
+def run_wsgi(urls, concurrency):
+    from django.test import Client
+
+    def get(url):
+        start = time.perf_counter()
+        response = Client().get(url)
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(get, urls))
+    return time.perf_counter() - start, latencies
+
+
+def run_asgi(urls, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get(url):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*[get(url) for url in urls])
+        return time.perf_counter() - start, latencies
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+
+    from techtest.articles.models import Article
+    from techtest.authors.models import Author
+    from techtest.regions.models import Region
+
+    if args.no_cache:
+        settings.API_CACHE = None
+
+    with test_database():
+        seed(authors=args.articles // 10, regions=100, articles=args.articles)
+        article_ids = list(Article.objects.values_list("id", flat=True)[:100])
+        author_ids = list(Author.objects.values_list("id", flat=True)[:100])
+        region_ids = list(Region.objects.values_list("id", flat=True)[:100])
+        paths = [
+            "/articles/?page_size=20",
+            "/authors/?page_size=20",
+            "/regions/?page_size=20",
+        ]
+        paths += ["/articles/%s/" % pk for pk in article_ids]
+        paths += ["/authors/%s/" % pk for pk in author_ids]
+        paths += ["/regions/%s/" % pk for pk in region_ids]
+        urls = [paths[i % len(paths)] for i in range(args.requests)]
+
+        use_async_views(False)
+        report("wsgi sync views", *run_wsgi(urls, args.concurrency))
+        report("asgi sync views", *run_asgi(urls, args.concurrency))
+        use_async_views(True)
+        report("asgi async views", *run_asgi(urls, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "techtest.settings")
+sys.path.append(os.path.join(os.path.realpath(os.path.dirname(__file__)), ".."))
+
+
+def setup():
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database():
+    """Runs the benchmark against a throwaway test database."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield name
+    finally:
+        connection.creation.destroy_test_db(name, verbosity=0)
+        teardown_test_environment()
+
+
+def words(rng, count, vocabulary=5000):
+    """Pseudo words with a skewed frequency, like the words of a real text."""
+    return " ".join(
+        "w%d" % (int(rng.paretovariate(1.0)) % vocabulary) for _ in range(count)
+    )
+
+
+def _skewed(rng, count):
+    """An index below ``count``, low ones far more likely (a few popular rows)."""
+    return (int(rng.paretovariate(1.2)) - 1) % count
+
+
+def seed(authors=100, regions=50, articles=1000, max_regions=5, seed=0):
+    """
+    Seeds ``authors``, ``regions`` and ``articles`` built by
+    ``techtest.factories`` with bulk inserts, next to any rows already there.
+    Article counts per author and per region are skewed, articles link to 0 to
+    ``max_regions`` regions, fewer far more often than more, and their content
+    is made of ``words``. The same ``seed`` seeds the same data.
+    """
+    import string
+
+    import factory.random
+    from django.db.models import Max
+
+    from techtest import factories, search
+    from techtest.articles.models import Article
+    from techtest.authors.models import Author
+    from techtest.regions.cache import region_cache
+    from techtest.regions.models import Region
+
+    # Region codes continue after the highest two letter code already taken
+    codes = [
+        string.ascii_uppercase.index(code[0]) * 26
+        + string.ascii_uppercase.index(code[1])
+        for code in Region.objects.values_list("code", flat=True)
+        if len(code) == 2 and set(code) <= set(string.ascii_uppercase)
+    ]
+    first_code = max(codes) + 1 if codes else 0
+    if first_code + regions > 26 * 26:
+        raise ValueError(
+            "Region codes are two letters, %s left." % (26 * 26 - first_code)
+        )
+    rng = random.Random(seed)
+    factory.random.reseed_random(seed)
+    factories.RegionFactory.reset_sequence(first_code)
+    last = {
+        model: model.objects.aggregate(last=Max("pk"))["last"] or 0
+        for model in (Author, Region, Article)
+    }
+
+    Author.objects.bulk_create(
+        factories.AuthorFactory.build_batch(authors), batch_size=1000
+    )
+    Region.objects.bulk_create(
+        factories.RegionFactory.build_batch(regions), batch_size=1000
+    )
+    region_cache.changed()
+    author_list = list(Author.objects.filter(pk__gt=last[Author]).order_by("id"))
+    region_ids = list(
+        Region.objects.filter(pk__gt=last[Region])
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    for start in range(0, articles, 1000):
+        Article.objects.bulk_create(
+            factories.ArticleFactory.build_batch(
+                min(1000, articles - start),
+                author=factory.LazyFunction(
+                    lambda: author_list[_skewed(rng, len(author_list))]
+                ),
+                content=factory.LazyFunction(lambda: words(rng, 80)),
+            )
+        )
+    fan_out = range(max_regions + 1)
+    weights = [1 / (count + 1) for count in fan_out]
+    Through = Article.regions.through
+    Through.objects.bulk_create(
+        (
+            Through(article_id=article_id, region_id=region_ids[index])
+            for article_id in Article.objects.filter(pk__gt=last[Article]).values_list(
+                "id", flat=True
+            )
+            for index in {
+                _skewed(rng, len(region_ids))
+                for _ in range(rng.choices(fan_out, weights)[0])
+            }
+        ),
+        batch_size=1000,
+    )
+    search.get_backend().rebuild()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def timings(times):
+    """Summary of a list of durations in seconds."""
+    return {
+        "rounds": len(times),
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "p50": percentile(times, 0.5),
+        "p95": percentile(times, 0.95),
+        "p99": percentile(times, 0.99),
+    }
+
+
+def save_results(path, benchmark, options, results):
+    """Writes ``results`` with what's needed to compare them across commits."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "commit": commit,
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "options": options,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
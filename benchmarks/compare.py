@@ -0,0 +1,44 @@
+"""
+Compares two results files written with ``--output`` by ``schemas.py`` or
+``load.py``, e.g. of the parent commit and the current one.
+
+    python benchmarks/compare.py before.json after.json [--metric p50]
+"""
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="p50")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    if before["benchmark"] != after["benchmark"]:
+        parser.error(
+            "Can't compare %s results to %s results."
+            % (before["benchmark"], after["benchmark"])
+        )
+
+    print(
+        "%-28s %12s %12s %8s"
+        % (args.metric, before["commit"] or "before", after["commit"] or "after", "")
+    )
+    for name, result in after["results"].items():
+        if name not in before["results"]:
+            print("%-28s %12s %10.3fms" % (name, "-", result[args.metric] * 1000))
+            continue
+        old, new = before["results"][name][args.metric], result[args.metric]
+        print(
+            "%-28s %10.3fms %10.3fms %+7.1f%%"
+            % (name, old * 1000, new * 1000, (new - old) / old * 100)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Requests/sec of a mix of article writers and list readers running in threads
+against a file backed SQLite database, with Django's defaults (a connection
+per request, rollback journal) against the tuned configuration (persistent
+connections, WAL and the other pragmas of ``techtest.db``).
+
+    python benchmarks/concurrent_writers.py [--writers 4] [--readers 4] [--seconds 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MODES = {
+    "default": {"DATABASE_CONN_MAX_AGE": "0", "DATABASE_SQLITE_TUNING": "0"},
+    "tuned": {"DATABASE_CONN_MAX_AGE": "60", "DATABASE_SQLITE_TUNING": "1"},
+}
+
+
+def run(args):
+    from common import setup
+
+    setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from techtest.authors.models import Author
+
+    setup_test_environment()
+    call_command("migrate", verbosity=0)
+    author = Author.objects.create(first_name="First", last_name="Last")
+    connection.close()
+
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def work(kind):
+        client = Client()
+        body = json.dumps(
+            {"title": "Title", "content": "Content", "author_id": author.pk}
+        )
+        while time.monotonic() < deadline:
+            try:
+                if kind == "writes":
+                    response = client.post(
+                        "/articles/", data=body, content_type="application/json"
+                    )
+                else:
+                    response = client.get("/articles/", {"page_size": 20})
+                ok = response.status_code in (200, 201)
+            except Exception:
+                ok = False
+            with lock:
+                counts[kind if ok else "errors"] += 1
+
+    threads = [
+        threading.Thread(target=work, args=("writes",)) for _ in range(args.writers)
+    ]
+    threads += [
+        threading.Thread(target=work, args=("reads",)) for _ in range(args.readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(json.dumps({kind: count / args.seconds for kind, count in counts.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        return run(args)
+
+    print("%-10s %10s %10s %10s" % ("mode", "writes/s", "reads/s", "errors/s"))
+    for mode, environ in MODES.items():
+        # Each mode gets its own process and database file: settings and the
+        # journal mode of a file can't be switched back and forth.
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.run(
+                [sys.executable, __file__, "--run", *sys.argv[1:]],
+                env=dict(
+                    os.environ,
+                    DATABASE_NAME=os.path.join(directory, "db.sqlite3"),
+                    **environ,
+                ),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        result = json.loads(output)
+        print(
+            "%-10s %10.0f %10.0f %10.0f"
+            % (mode, result["writes"], result["reads"], result["errors"])
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares encode/decode throughput of the JSON codecs in ``techtest.codec`` on
+a page of articles shaped like ``ArticleSchema`` output.
+
+    python benchmarks/json_codecs.py [--articles 1000] [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "techtest.settings")
+sys.path.append(os.path.join(os.path.realpath(os.path.dirname(__file__)), ".."))
+
+from techtest import codec
+
+
+def article_payload(count):
+    return [
+        {
+            "id": i,
+            "title": "Article %s about cafés" % i,
+            "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20,
+            "author": {"id": i % 50, "first_name": "Jane", "last_name": "Doe"},
+            "regions": [
+                {"id": 1, "code": "AL", "name": "Albania"},
+                {"id": 2, "code": "UK", "name": "United Kingdom"},
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = article_payload(args.articles)
+    print("%-8s %14s %14s %10s" % ("codec", "encode MB/s", "decode MB/s", "size KB"))
+    for name in codec.BACKENDS:
+        try:
+            backend = codec.load_codec(name)
+        except ImportError:
+            print("%-8s %14s" % (name, "not installed"))
+            continue
+        encoded = backend.dumps(payload)
+        megabytes = len(encoded) / 1e6
+        encode = min(
+            timeit.repeat(lambda: backend.dumps(payload), number=1, repeat=args.repeat)
+        )
+        decode = min(
+            timeit.repeat(lambda: backend.loads(encoded), number=1, repeat=args.repeat)
+        )
+        print(
+            "%-8s %14.1f %14.1f %10.1f"
+            % (name, megabytes / encode, megabytes / decode, len(encoded) / 1e3)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+In-process load generator: sends requests to every route of
+``techtest.urls`` from concurrent clients and reports throughput and latency
+percentiles per route.
+
+    python benchmarks/load.py [--requests 200] [--concurrency 8]
+                              [--articles 5000] [--no-cache] [--snapshots]
+                              [--materialized]
+                              [--output results.json]
+
+Requests go through Django's test client, so the numbers leave out the HTTP
+server. Routes that write are sent one at a time: the SQLite test database
+is shared in memory and locks whole tables. Every URL name needs an entry
+in ``routes``, a new route without one fails the run instead of going
+unmeasured.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import percentile, save_results, seed, setup, test_database, timings
+
+
+def routes(article, author, region):
+    """(method, path, body) to send to each URL name."""
+    bulk = [
+        {
+            "id": article.pk,
+            "title": article.title,
+            "content": article.content,
+            "author_id": article.author_id,
+            "regions": [{"id": region.pk}],
+        }
+    ]
+    return {
+        "articles-list": ("get", "/articles/?page_size=20", None),
+        "articles-search": ("get", "/articles/search/?q=w1&page_size=20", None),
+        "articles-export": ("get", "/articles/export/", None),
+        "articles-bulk": ("post", "/articles/bulk/", bulk),
+        "article": ("get", "/articles/%s/" % article.pk, None),
+        "regions-list": ("get", "/regions/?page_size=20", None),
+        "region": ("get", "/regions/%s/" % region.pk, None),
+        "region-code": ("get", "/regions/%s/" % region.code, None),
+        "authors-list": ("get", "/authors/?page_size=20", None),
+        "author": ("get", "/authors/%s/" % author.pk, None),
+        "metrics": ("get", "/metrics/", None),
+    }
+
+
+def run(method, path, body, count, concurrency):
+    from django.test import Client
+
+    from techtest import codec
+
+    def send(_):
+        start = time.perf_counter()
+        if body is None:
+            response = getattr(Client(), method)(path)
+        else:
+            response = getattr(Client(), method)(
+                path, codec.dumps(body), content_type="application/json"
+            )
+        assert response.status_code < 300, (path, response.status_code)
+        return time.perf_counter() - start
+
+    if method != "get":
+        concurrency = 1
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(send, range(count)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--snapshots", action="store_true")
+    parser.add_argument("--materialized", action="store_true")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.conf import settings
+
+    from techtest import urls
+    from techtest.articles import rendering, snapshots
+    from techtest.articles.models import Article
+    from techtest.regions.models import Region
+
+    if args.no_cache:
+        settings.API_CACHE = None
+    settings.METRICS_ENABLED = True
+    settings.SNAPSHOTS = args.snapshots
+    settings.MATERIALIZED_RESPONSES = args.materialized
+
+    with test_database():
+        seed(authors=args.articles // 10, regions=100, articles=args.articles)
+        if args.snapshots:
+            snapshots.refresh(Article.objects.all())
+        if args.materialized:
+            rendering.render_many(Article.objects.values_list("pk", flat=True))
+        article = Article.objects.select_related("author").first()
+        requests = routes(article, article.author, Region.objects.first())
+        names = [
+            pattern.name
+            for pattern in urls.urlpatterns
+            if getattr(pattern, "name", None)
+        ]
+        missing = set(names) - set(requests)
+        assert not missing, "No request for %s" % ", ".join(sorted(missing))
+
+        results = {}
+        print("%-16s %10s %10s %10s %10s" % ("route", "req/s", "p50", "p95", "p99"))
+        for name in names:
+            elapsed, latencies = run(*requests[name], args.requests, args.concurrency)
+            result = results[name] = dict(
+                timings(latencies), throughput=len(latencies) / elapsed
+            )
+            print(
+                "%-16s %10.0f %8.2fms %8.2fms %8.2fms"
+                % (
+                    name,
+                    result["throughput"],
+                    percentile(latencies, 0.5) * 1000,
+                    percentile(latencies, 0.95) * 1000,
+                    percentile(latencies, 0.99) * 1000,
+                )
+            )
+    if args.output:
+        save_results(args.output, "load", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Microbenchmarks of every schema: dumping one instance and a page, the page
+again through a fresh marshmallow schema (what every request did before
+schemas were cached and their dump functions generated), loading one payload
+onto the instance it updates (the PUT path) and, for articles, a bulk load.
+Each round runs in a new loader scope and a rolled back transaction, so
+rounds don't share memoized lookups or see each other's writes.
+
+    python benchmarks/schemas.py [--articles 2000] [--page 100] [--rounds 200]
+                                 [--output results.json]
+"""
+import argparse
+import time
+
+from common import save_results, seed, setup, test_database, timings
+
+
+def measure(func, rounds, warmup=5):
+    from django.db import transaction
+
+    from techtest.loaders import request_scope
+
+    times = []
+    for i in range(warmup + rounds):
+        with transaction.atomic(), request_scope():
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        if i >= warmup:
+            times.append(elapsed)
+    return timings(times)
+
+
+def cases(page_size):
+    from techtest.articles.models import Article
+    from techtest.articles.schemas import ArticleBulkSchema, ArticleSchema
+    from techtest.authors.models import Author
+    from techtest.authors.schemas import AuthorSchema
+    from techtest.regions.models import Region
+    from techtest.regions.schemas import RegionSchema
+    from techtest.schemas import dump, get_schema
+    from techtest.utils import optimize_queryset
+
+    found = {}
+    for model, schema_class in (
+        (Author, AuthorSchema),
+        (Region, RegionSchema),
+        (Article, ArticleSchema),
+    ):
+        schema = get_schema(schema_class)
+        page = list(optimize_queryset(model.objects.order_by("id"), schema)[:page_size])
+        name = schema_class.__name__
+        payload = dump(schema, page[0])
+        if model is Article:
+            payload = dict(payload, author_id=payload.pop("author")["id"])
+
+        def load(instance=page[0], payload=payload, schema_class=schema_class):
+            schema_class(context={"instance": instance}).load(payload)
+
+        def dump_page_uncached(schema_class=schema_class, page=page):
+            return schema_class().dump(page, many=True)
+
+        assert dump_page_uncached() == dump(schema, page, many=True), name
+        found.update(
+            {
+                "%s.dump" % name: lambda schema=schema, obj=page[0]: dump(schema, obj),
+                "%s.dump_page"
+                % name: lambda schema=schema, page=page: dump(schema, page, many=True),
+                "%s.dump_page_uncached" % name: dump_page_uncached,
+                "%s.load" % name: load,
+            }
+        )
+        if model is Article:
+            items = [
+                dict(item, author_id=item.pop("author")["id"])
+                for item in dump(schema, page, many=True)
+            ]
+            found["ArticleBulkSchema.load_page"] = lambda: ArticleBulkSchema(
+                many=True
+            ).load(items)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    setup()
+
+    with test_database():
+        seed(authors=args.articles // 10, regions=100, articles=args.articles)
+        results = {}
+        print("%-34s %12s %12s %12s %12s" % ("case", "min", "mean", "p99", "ops/s"))
+        for name, func in cases(args.page).items():
+            result = results[name] = measure(func, args.rounds)
+            print(
+                "%-34s %10.1fus %10.1fus %10.1fus %12.0f"
+                % (
+                    name,
+                    result["min"] * 1e6,
+                    result["mean"] * 1e6,
+                    result["p99"] * 1e6,
+                    1 / result["mean"],
+                )
+            )
+    if args.output:
+        save_results(args.output, "schemas", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
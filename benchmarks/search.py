@@ -0,0 +1,50 @@
+"""
+Latency of a first page of article search results with the FTS5 index
+against the naive ``icontains`` scan, for common, rare and multi word queries.
+(``icontains`` also matches inside words, so its hits are a superset.)
+
+    python benchmarks/search.py [--articles 200000] [--repeat 5]
+"""
+import argparse
+import timeit
+
+from common import seed, setup, test_database
+
+QUERIES = ["w1", "w2 w3", "w700", "w4321 w1", "nothing"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+
+    from techtest.search import FTS5Backend, LikeBackend
+
+    with test_database():
+        # Articles are made of pseudo words w1, w2, ..., w1 the most common
+        seed(authors=args.articles // 10, regions=100, articles=args.articles)
+        backends = {"fts5": FTS5Backend(), "icontains": LikeBackend()}
+
+        print("%-12s %14s %14s" % ("query", *backends))
+        for query in QUERIES:
+            timings = [
+                min(
+                    timeit.repeat(
+                        lambda: backend.search(query, 0, 100),
+                        number=1,
+                        repeat=args.repeat,
+                    )
+                )
+                for backend in backends.values()
+            ]
+            print(
+                "%-12s %14s %14s"
+                % (query, *("%.2f ms" % (timing * 1000) for timing in timings))
+            )
+
+
+if __name__ == "__main__":
+    main()
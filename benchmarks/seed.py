@@ -0,0 +1,34 @@
+"""
+Seeds the configured database (``db.sqlite3`` unless ``DATABASE_*`` says
+otherwise) with generated authors, regions and articles, to try the API
+against more than the handful of rows ``setup_and_seed.py`` creates.
+
+    python benchmarks/seed.py [--authors 1000] [--regions 200]
+                              [--articles 100000] [--max-regions 5] [--seed 0]
+"""
+import argparse
+
+from common import seed, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--regions", type=int, default=200)
+    parser.add_argument("--articles", type=int, default=100000)
+    parser.add_argument("--max-regions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.core import management
+    from django.db import transaction
+
+    management.call_command("migrate", verbosity=0)
+    with transaction.atomic():
+        seed(args.authors, args.regions, args.articles, args.max_regions, args.seed)
+
+
+if __name__ == "__main__":
+    main()
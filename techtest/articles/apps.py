@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ArticlesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "techtest.articles"
+
+    def ready(self):
+        # Connects the signal handlers
+        import techtest.articles.rendering  # noqa: F401
+        import techtest.articles.signals  # noqa: F401
+        import techtest.articles.snapshots  # noqa: F401
+        import techtest.cache  # noqa: F401
+        import techtest.loaders  # noqa: F401
+        import techtest.metrics  # noqa: F401
+        import techtest.search  # noqa: F401
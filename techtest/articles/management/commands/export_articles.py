@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from marshmallow import ValidationError
+
+from techtest.articles.models import Article
+from techtest.articles.schemas import ArticleExportSchema, ArticleSchema
+from techtest.schemas import get_schema
+from techtest.utils import iter_gzip, iter_ndjson, optimize_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes every article as newline delimited JSON, in id order. Resume an "
+        "interrupted export with --after set to the last id written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default="-", help="File to write to, - for stdout."
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument(
+            "--after", type=int, help="Appends the articles after this id."
+        )
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, output, gzip, after, chunk_size, **options):
+        try:
+            filters = ArticleExportSchema().load(
+                {} if after is None else {"after": after}
+            )
+        except ValidationError as e:
+            raise CommandError(e.messages)
+        schema = get_schema(ArticleSchema)
+        articles = optimize_queryset(
+            Article.objects.filter(**filters).order_by("pk"), schema
+        )
+        content = iter_ndjson(articles, schema, chunk_size)
+        if gzip:
+            # Appending makes a multi member gzip file, read as one stream
+            content = iter_gzip(content)
+
+        if output == "-":
+            stream = sys.stdout.buffer
+        else:
+            stream = open(output, "wb" if after is None else "ab")
+        try:
+            for chunk in content:
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
@@ -0,0 +1,108 @@
+import csv
+import gzip
+import io
+import itertools
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from marshmallow import ValidationError
+
+from techtest import codec
+from techtest.articles.schemas import ArticleBulkSchema
+from techtest.loaders import request_scope
+
+
+def read_ndjson(stream):
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            item = codec.loads(line)
+        except ValueError as e:
+            raise CommandError("Line %s: invalid JSON (%s)." % (number, e))
+        # Exported articles nest their author
+        if isinstance(item, dict) and isinstance(item.get("author"), dict):
+            item.setdefault("author_id", item.pop("author").get("id"))
+        yield number, item
+
+
+def read_csv(stream):
+    # Columns: id (empty for new articles), title, content, author_id and
+    # regions, region codes separated by spaces
+    reader = csv.DictReader(stream)
+    for row in reader:
+        item = dict(row)
+        if not item.get("id"):
+            item.pop("id", None)
+        if item.get("author_id") == "":
+            item["author_id"] = None
+        if "regions" in item:
+            item["regions"] = [{"code": code} for code in item["regions"].split()]
+        yield reader.line_num, item
+
+
+FORMATS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports articles from NDJSON (one article per line, as exported by "
+        "export_articles) or CSV, validated like POST /articles/bulk/: items "
+        "with an id update that article, or create it with that id when it "
+        "doesn't exist. Each batch is written in its own transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File to read, - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Defaults to csv for .csv files and ndjson otherwise.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, input, format, batch_size, **options):
+        name = input[:-3] if input.endswith(".gz") else input
+        format = format or ("csv" if name.endswith(".csv") else "ndjson")
+        if input == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        elif input.endswith(".gz"):
+            stream = gzip.open(input, "rt", encoding="utf-8", newline="")
+        else:
+            stream = open(input, encoding="utf-8", newline="")
+
+        start = time.perf_counter()
+        imported = 0
+        with stream:
+            items = FORMATS[format](stream)
+            while True:
+                batch = list(itertools.islice(items, batch_size))
+                if not batch:
+                    break
+                lines, data = zip(*batch)
+                try:
+                    # Authors and regions are looked up once per batch, missing
+                    # articles are created so an export restores a wiped table
+                    with request_scope():
+                        schema = ArticleBulkSchema(
+                            many=True, context={"create_missing": True}
+                        )
+                        schema.load(list(data))
+                except ValidationError as e:
+                    errors = {
+                        lines[index]: messages for index, messages in e.messages.items()
+                    }
+                    raise CommandError(
+                        "Invalid articles, imported the %s before line %s: %s"
+                        % (imported, lines[0], errors)
+                    )
+                imported += len(batch)
+                if options["verbosity"] > 1:
+                    self.stdout.write("Imported %s articles." % imported)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            "Imported %s articles in %.1fs (%.0f rows/s)."
+            % (imported, elapsed, imported / elapsed if elapsed else 0)
+        )
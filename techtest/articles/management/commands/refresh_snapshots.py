@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from techtest.articles import snapshots
+from techtest.articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the author and region snapshots of every article."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        snapshots.refresh(Article.objects.all(), batch_size=batch_size)
@@ -0,0 +1,30 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from techtest.articles import rendering
+from techtest.articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Renders and stores the detail response of every article."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=os.cpu_count())
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, processes, batch_size, **options):
+        ids = list(Article.objects.order_by("pk").values_list("pk", flat=True))
+        batches = [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+        if processes <= 1:
+            rendered = sum(map(rendering.render_many, batches))
+        else:
+            # Forked workers must not share the parent's connections, spawned
+            # ones start without Django set up
+            connections.close_all()
+            with ProcessPoolExecutor(processes, initializer=django.setup) as executor:
+                rendered = sum(executor.map(rendering.render_many, batches))
+        self.stdout.write("Rendered %s articles." % rendered)
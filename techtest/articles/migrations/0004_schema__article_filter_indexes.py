@@ -0,0 +1,41 @@
+# Generated by Django 3.2.7 on 2026-10-18 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0002_schema__author_updated_at"),
+        ("articles", "0003_schema__article_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="article",
+            name="author",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="articles",
+                to="authors.author",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["author", "id"], name="article_author_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(fields=["title", "id"], name="article_title_id_idx"),
+        ),
+        # The auto created through table only indexes region_id on its own,
+        # (region_id, article_id) lets ?region= walk its articles in id order.
+        migrations.RunSQL(
+            "CREATE INDEX articles_article_regions_region_article_idx "
+            "ON articles_article_regions (region_id, article_id)",
+            "DROP INDEX articles_article_regions_region_article_idx",
+        ),
+    ]
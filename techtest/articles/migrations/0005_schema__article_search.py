@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Full text index of the SQLite search backend (techtest.search.FTS5Backend),
+# other databases search without one.
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE articles_article_search USING fts5("
+        "title, content, tokenize = 'porter unicode61')"
+    )
+    schema_editor.execute(
+        "INSERT INTO articles_article_search (rowid, title, content) "
+        "SELECT id, title, content FROM articles_article"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE articles_article_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0004_schema__article_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.7 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0005_schema__article_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="author_snapshot",
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="regions_snapshot",
+            field=models.JSONField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.7 on 2026-10-18 12:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0006_schema__article_snapshots"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RenderedArticle",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rendered",
+                        serialize=False,
+                        to="articles.article",
+                    ),
+                ),
+                ("content", models.BinaryField()),
+                ("etag", models.CharField(max_length=34)),
+                ("last_modified", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.7 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    # Deletes bump an existing row with a single UPDATE
+    TableVersion = apps.get_model("articles", "TableVersion")
+    TableVersion.objects.bulk_create(
+        TableVersion(table=table)
+        for table in ("articles_article", "authors_author", "regions_region")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0007_schema__rendered_article"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TableVersion",
+            fields=[
+                (
+                    "table",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
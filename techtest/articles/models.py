@@ -8,5 +8,43 @@ class Article(models.Model):
         "regions.Region", related_name="articles", blank=True
     )
     author = models.ForeignKey(
-        "authors.Author", related_name="articles", on_delete=models.CASCADE, null=True
+        "authors.Author",
+        related_name="articles",
+        on_delete=models.CASCADE,
+        null=True,
+        db_index=False,
     )
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Dumped author and regions, kept up to date when SNAPSHOTS is on so an
+    # article renders from its own row (see techtest.articles.snapshots)
+    author_snapshot = models.JSONField(null=True, editable=False)
+    regions_snapshot = models.JSONField(null=True, editable=False)
+
+    class Meta:
+        # Filtered list pages are range scans ordered by id, so each filter
+        # column gets an index that ends with the id.
+        indexes = [
+            models.Index(fields=["author", "id"], name="article_author_id_idx"),
+            models.Index(fields=["title", "id"], name="article_title_id_idx"),
+        ]
+
+
+class RenderedArticle(models.Model):
+    """The detail response body of an article, rendered when it's written."""
+
+    article = models.OneToOneField(
+        Article, primary_key=True, related_name="rendered", on_delete=models.CASCADE
+    )
+    content = models.BinaryField()
+    etag = models.CharField(max_length=34)
+    last_modified = models.DateTimeField()
+
+
+class TableVersion(models.Model):
+    """
+    Bumped whenever rows are deleted from ``table``, which list ETags can't
+    tell from the table's max ``updated_at``.
+    """
+
+    table = models.CharField(max_length=255, primary_key=True)
+    version = models.BigIntegerField(default=0)
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.http.response import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from techtest import codec
+
+# Connects the receivers touching updated_at, which the ETag includes, ahead
+# of the ones below
+from techtest.articles import signals  # noqa: F401
+from techtest.articles.models import Article, RenderedArticle
+from techtest.articles.schemas import ArticleSchema
+from techtest.authors.models import Author
+from techtest.cache import article_dependencies, depends_on
+from techtest.regions.models import Region
+from techtest.schemas import dump, get_schema
+from techtest.utils import make_etag, optimize_queryset
+
+# With MATERIALIZED_RESPONSES on, the full detail response of an article is
+# rendered when the article is written and stored in RenderedArticle, and
+# GET /articles/<id>/ answers with the stored bytes. Writes to an author or
+# a region drop the renderings they show up in, those are rendered again by
+# the article's next write or by ``manage.py render_articles``; meanwhile
+# GETs serialize the article without storing anything.
+
+
+def validators(article):
+    """ETag and Last-Modified of an article's detail response."""
+    versions = [(article.pk, article.updated_at)]
+    if article.author:
+        versions.append((article.author.pk, article.author.updated_at))
+    versions += [(region.pk, region.updated_at) for region in article.regions.all()]
+    return make_etag(*versions), max(updated_at for _, updated_at in versions)
+
+
+def render(article):
+    """A RenderedArticle for ``article``, with its author and regions loaded."""
+    etag, last_modified = validators(article)
+    return RenderedArticle(
+        article_id=article.pk,
+        content=codec.dumps(dump(get_schema(ArticleSchema), article)),
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+def render_many(article_ids):
+    """Renders and stores the articles with the given ids."""
+    articles = optimize_queryset(
+        Article.objects.filter(pk__in=article_ids), get_schema(ArticleSchema), False
+    )
+    rendered = [render(article) for article in articles]
+    with transaction.atomic():
+        RenderedArticle.objects.filter(article_id__in=article_ids).delete()
+        RenderedArticle.objects.bulk_create(rendered)
+    return len(rendered)
+
+
+def forget(article_ids):
+    RenderedArticle.objects.filter(article_id__in=article_ids).delete()
+
+
+def get_response(request, article_id):
+    """
+    The stored response of the article, None if it isn't stored or the
+    request asks for more than the full representation.
+    """
+    if (
+        not settings.MATERIALIZED_RESPONSES
+        or request.method not in ("GET", "HEAD")
+        or request.GET
+    ):
+        return None
+    rendered = RenderedArticle.objects.filter(pk=article_id).first()
+    if rendered is None:
+        return None
+    timestamp = int(rendered.last_modified.timestamp())
+    response = get_conditional_response(
+        request, etag=rendered.etag, last_modified=timestamp
+    )
+    if response is None:
+        content = bytes(rendered.content)
+        article = codec.loads(content)
+        response = depends_on(
+            HttpResponse(content, content_type="application/json"),
+            *article_dependencies(
+                (article["author"] or {}).get("id"),
+                [region["id"] for region in article["regions"]],
+            )
+        )
+    if response.status_code in (200, 304):
+        response["ETag"] = rendered.etag
+        response["Last-Modified"] = http_date(timestamp)
+    return response
+
+
+@receiver(post_save, sender=Article)
+def render_article(sender, instance, created, **kwargs):
+    # A new article has no regions yet, adding them sends m2m_changed. One
+    # that never gets any is rendered by its next write.
+    if settings.MATERIALIZED_RESPONSES and not created:
+        render(instance).save()
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def render_article_regions(sender, instance, action, reverse, pk_set, **kwargs):
+    if not settings.MATERIALIZED_RESPONSES:
+        return
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        # The relation's prefetched regions are stale
+        getattr(instance, "_prefetched_objects_cache", {}).pop("regions", None)
+        render(instance).save()
+    elif reverse and action in ("post_add", "post_remove"):
+        forget(pk_set)
+    elif reverse and action == "pre_clear":
+        forget(instance.articles.values("id"))
+
+
+@receiver(post_save, sender=Author)
+def forget_author_articles(sender, instance, created, **kwargs):
+    if settings.MATERIALIZED_RESPONSES and not created:
+        forget(instance.articles.values("id"))
+
+
+@receiver(post_save, sender=Region)
+@receiver(pre_delete, sender=Region)
+def forget_region_articles(sender, instance, created=False, **kwargs):
+    if settings.MATERIALIZED_RESPONSES and not created:
+        forget(instance.articles.values("id"))
@@ -1,18 +1,32 @@
 from functools import partial
 
-from marshmallow import Schema, ValidationError, fields, validate, validates
-from marshmallow.decorators import post_load
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from marshmallow import EXCLUDE, Schema, ValidationError, fields, validate, validates
+from marshmallow.decorators import post_load, pre_load
 
-from techtest.articles.models import Article
+from techtest import search
+from techtest.articles import snapshots
+from techtest.articles.models import Article, RenderedArticle
 from techtest.authors.models import Author
 from techtest.authors.schemas import AuthorSchema
+from techtest.cache import invalidate
+from techtest.loaders import get_loader
+from techtest.regions.cache import region_cache
 from techtest.regions.models import Region
 from techtest.regions.schemas import RegionSchema
+from techtest.schemas import dump, get_schema, update_instance
 
 
 class ArticleSchema(Schema):
     class Meta(object):
         model = Article
+        select_related = {"author": "author"}
+        prefetch_related = {"regions": "regions"}
+        snapshots = {"author": "author_snapshot", "regions": "regions_snapshot"}
 
     id = fields.Integer()
     title = fields.String(validate=validate.Length(max=255))
@@ -23,29 +37,356 @@ class ArticleSchema(Schema):
     author = fields.Nested(AuthorSchema, dump_only=True)
     author_id = fields.Integer(required=True, load_only=True)
 
+    @pre_load(pass_many=True)
+    def prime_loaders(self, data, many, **kwargs):
+        # Queues the authors and regions of every article so the validators
+        # fetch them all with one query per model
+        items = [item for item in (data if many else [data]) if isinstance(item, dict)]
+        regions = [
+            region
+            for item in items
+            if isinstance(item.get("regions"), list)
+            for region in item["regions"]
+            if isinstance(region, dict)
+        ]
+        self.author_loader = get_loader(Author)
+        instance = self.context.get("instance")
+        if instance is not None:
+            # The article being updated already has its author and regions
+            self.author_loader.remember([instance.author] if instance.author else [])
+            get_loader(Region).remember(instance.regions.all())
+        self.author_loader.prime(_to_int(item.get("author_id")) for item in items)
+        region_cache.prime(
+            ids=[_to_int(region.get("id")) for region in regions],
+            codes=[region.get("code") for region in regions if "id" not in region],
+        )
+        return data
+
     @validates("author_id")
     def validate_author_id(self, author_id):
-        try:
-            self.author = Author.objects.get(id=author_id)
-        except Author.DoesNotExist:
+        if self.author_loader.load(author_id) is None:
             raise ValidationError("Invalid author id.")
 
     def get_regions(self, article):
-        return RegionSchema().dump(article.regions.all(), many=True)
+        return dump(get_schema(RegionSchema), article.regions.all(), many=True)
 
     def load_regions(self, regions):
-        return [
-            Region.objects.get_or_create(id=region.pop("id", None), defaults=region)[0]
-            for region in regions
-        ]
+        # Known regions come from the region cache, by id or else by code
+        by_id, by_code = region_cache.get_many(
+            ids={_to_int(region.get("id")) for region in regions} - {None},
+            codes={region.get("code") for region in regions if "id" not in region},
+        )
+        resolved = []
+        for region in regions:
+            region_id = region.pop("id", None)
+            if region_id is None and region.get("code") in by_code:
+                resolved.append(by_code[region["code"]])
+            elif _to_int(region_id) in by_id:
+                resolved.append(by_id[_to_int(region_id)])
+            else:
+                resolved.append(
+                    Region.objects.get_or_create(id=region_id, defaults=region)[0]
+                )
+        return resolved
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
         regions = data.pop("regions", None)
+        if "author_id" in data:
+            # Partial loads may leave the author out
+            data["author"] = self.author_loader.load(data.pop("author_id"))
+        instance = self.context.get("instance")
+        if instance is not None and data.get("id") == instance.pk:
+            data.pop("id")
+            return self.update(instance, data, regions)
+
         article, _ = Article.objects.update_or_create(
-            id=data.pop("id", None), author=self.author, defaults=data
+            id=data.pop("id", None), author=data.pop("author"), defaults=data
         )
         if isinstance(regions, list):
             article.regions.set(regions)
 
         return article
+
+    def update(self, article, data, regions):
+        # Diffs the regions against the prefetched ones instead of letting
+        # regions.set() query them, the article's own UPDATE stands in for the
+        # m2m_changed receivers (updated_at and the cache invalidation).
+        current = {region.pk: region for region in article.regions.all()}
+        if regions is None:
+            regions = current
+        else:
+            regions = {region.pk: region for region in regions}
+        removed, added = (
+            current.keys() - regions.keys(),
+            regions.keys() - current.keys(),
+        )
+        Through = Article.regions.through
+        with transaction.atomic():
+            if removed:
+                Through.objects.filter(
+                    article_id=article.pk, region_id__in=removed
+                ).delete()
+            if added:
+                Through.objects.bulk_create(
+                    Through(article_id=article.pk, region_id=region_id)
+                    for region_id in added
+                )
+            # What prefetch_related would have left in place for the new
+            # regions, set before saving so the save signals see them
+            prefetched = article.regions.all()
+            prefetched._result_cache = sorted(
+                regions.values(), key=lambda region: region.pk
+            )
+            prefetched._prefetch_done = True
+            article._prefetched_objects_cache["regions"] = prefetched
+            update_instance(article, data, touch=bool(removed or added))
+        return article
+
+
+def bulk_insert(model, objs):
+    """
+    ``bulk_create`` that always leaves primary keys set on ``objs``, objects
+    given one keep it.
+    """
+    if not objs:
+        return objs
+    given = [obj for obj in objs if obj.pk is not None]
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objs)
+    else:
+        # Inserted first, so reading back the generated keys doesn't see them
+        model.objects.bulk_create(given)
+        _insert_generating_pks(model, [obj for obj in objs if obj.pk is None])
+    if given:
+        # Rows inserted with their key don't advance PostgreSQL's sequences
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+    return objs
+
+
+def _insert_generating_pks(model, objs):
+    if not objs:
+        return
+    if connection.vendor == "sqlite":
+        # SQLite serializes writers, so inside the transaction every row above
+        # the current max is ours.
+        last_pk = model.objects.aggregate(last_pk=Max("pk"))["last_pk"] or 0
+        model.objects.bulk_create(objs)
+        new_pks = model.objects.filter(pk__gt=last_pk).order_by("pk")
+        for obj, pk in zip(objs, new_pks.values_list("pk", flat=True)):
+            obj.pk = pk
+        return
+    # Elsewhere (MySQL) concurrent inserts interleave, only the id of a single
+    # row insert can be told apart.
+    meta = model._meta
+    fields = [field for field in meta.local_concrete_fields if not field.primary_key]
+    for obj in objs:
+        [(obj.pk,)] = model.objects._insert(
+            [obj], fields, returning_fields=meta.db_returning_fields
+        )
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ArticleBulkSchema(ArticleSchema):
+    """
+    Loads a list of articles, resolving every referenced article, author and
+    region with one query per model and writing them all in one transaction.
+
+    With ``create_missing`` in the context, items whose id matches no article
+    are created with that id and regions whose id matches no region are looked
+    up by code instead, so an export can be restored into an empty database.
+    """
+
+    @pre_load(pass_many=True)
+    def resolve_references(self, data, many, **kwargs):
+        items = [item for item in (data if many else [data]) if isinstance(item, dict)]
+        region_dicts = [
+            region
+            for item in items
+            if isinstance(item.get("regions"), list)
+            for region in item["regions"]
+            if isinstance(region, dict)
+        ]
+        self.articles = Article.objects.in_bulk(
+            {_to_int(item["id"]) for item in items if "id" in item} - {None}
+        )
+        self.authors = get_loader(Author).load_many(
+            {_to_int(item.get("author_id")) for item in items} - {None}
+        )
+        region_ids = {_to_int(region.get("id")) for region in region_dicts} - {None}
+        region_codes = {region.get("code") for region in region_dicts} - {None}
+        self.regions, self.regions_by_code = region_cache.get_many(
+            region_ids, region_codes
+        )
+        self.new_regions = {}
+        self.seen_ids = set()
+        return data
+
+    @validates("id")
+    def validate_id(self, article_id):
+        if article_id not in self.articles and not self.context.get("create_missing"):
+            raise ValidationError("No Article matches the given query")
+        if article_id in self.seen_ids:
+            raise ValidationError("Duplicate article id.")
+        self.seen_ids.add(article_id)
+
+    @validates("author_id")
+    def validate_author_id(self, author_id):
+        if author_id not in self.authors:
+            raise ValidationError("Invalid author id.")
+
+    def load_regions(self, regions):
+        resolved = []
+        for region in regions:
+            if "id" in region:
+                region_id = _to_int(region["id"])
+                if region_id in self.regions:
+                    resolved.append(self.regions[region_id])
+                    continue
+                if not self.context.get("create_missing") or "code" not in region:
+                    raise ValidationError("Invalid region id.")
+                region = {key: value for key, value in region.items() if key != "id"}
+            errors = get_schema(RegionSchema, only=("code", "name")).validate(region)
+            if errors:
+                raise ValidationError(errors)
+            code = region["code"]
+            if code not in self.regions_by_code:
+                self.regions_by_code[code] = self.new_regions[code] = Region(**region)
+            resolved.append(self.regions_by_code[code])
+        return resolved
+
+    def update_or_create(self, data, *args, **kwargs):
+        # Overridden without @post_load: items are written together in save_all
+        return data
+
+    @post_load(pass_many=True)
+    def save_all(self, data, many, **kwargs):
+        items = data if many else [data]
+        articles, created, updated, replaced = [], [], [], []
+        fields = {"author", "updated_at"}
+        now = timezone.now()
+        with transaction.atomic():
+            if self.new_regions:
+                bulk_insert(Region, list(self.new_regions.values()))
+                region_cache.changed()
+            for item in items:
+                item["author"] = self.authors[item.pop("author_id")]
+                article_id = item.pop("id", None)
+                regions = item.pop("regions", None)
+                if article_id not in self.articles:
+                    article = Article(id=article_id, **item)
+                    created.append(article)
+                else:
+                    article = self.articles[article_id]
+                    for field, value in item.items():
+                        setattr(article, field, value)
+                    article.updated_at = now
+                    fields.update(item)
+                    updated.append(article)
+                    if regions is not None:
+                        replaced.append(article.pk)
+                articles.append((article, regions))
+                if settings.SNAPSHOTS:
+                    # Bulk queries send no signals, snapshots go with the rows
+                    article.author_snapshot = snapshots.dump_author(article.author)
+                    fields.add("author_snapshot")
+                    if article_id not in self.articles or regions is not None:
+                        article.regions_snapshot = dump(
+                            get_schema(RegionSchema),
+                            sorted(regions or [], key=lambda region: region.pk),
+                            many=True,
+                        )
+                        fields.add("regions_snapshot")
+
+            bulk_insert(Article, created)
+            if updated:
+                Article.objects.bulk_update(updated, fields)
+                if settings.MATERIALIZED_RESPONSES:
+                    # Rendered again by their next write or render_articles
+                    RenderedArticle.objects.filter(
+                        article_id__in=[article.pk for article in updated]
+                    ).delete()
+
+            Through = Article.regions.through
+            Through.objects.filter(article_id__in=replaced).delete()
+            Through.objects.bulk_create(
+                Through(article_id=article.pk, region_id=region_id)
+                for article, regions in articles
+                for region_id in {region.pk for region in regions or []}
+            )
+            # Bulk queries don't send model signals
+            search.get_backend().index(article for article, _ in articles)
+            invalidate(
+                "articles",
+                "regions",
+                *["article:%s" % article.pk for article in updated]
+            )
+        if many:
+            return [article for article, _ in articles]
+        return articles[0][0]
+
+
+class ArticleFilterSchema(Schema):
+    """Loads the ``/articles/`` query string into queryset filters."""
+
+    class Meta(object):
+        unknown = EXCLUDE
+
+    author_id = fields.Integer()
+    region = fields.String(validate=validate.Length(equal=2))
+    title__startswith = fields.String(validate=validate.Length(min=1, max=255))
+
+    @post_load
+    def to_filters(self, data, *args, **kwargs):
+        filters = {}
+        if "author_id" in data:
+            filters["author_id"] = data["author_id"]
+        if "region" in data:
+            filters["regions__code"] = data["region"]
+        if "title__startswith" in data:
+            prefix = data["title__startswith"]
+            if connection.vendor == "sqlite":
+                # SQLite's LIKE is case insensitive and takes an ESCAPE clause,
+                # it can't use the title index, a range on the prefix can. The
+                # range only matches the prefix where text compares by code
+                # point (SQLite's BINARY collation), ``startswith`` stays on to
+                # keep the exact semantics.
+                filters["title__gte"] = prefix
+                upper = _next_character(prefix[-1])
+                if upper is not None:
+                    filters["title__lt"] = prefix[:-1] + upper
+            filters["title__startswith"] = prefix
+        return filters
+
+
+def _next_character(character):
+    """The next code point that can be encoded, ``None`` after the last one."""
+    code = ord(character) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # Surrogates only exist in pairs in UTF-16, not on their own
+        code = 0xE000
+    return chr(code) if code <= 0x10FFFF else None
+
+
+class ArticleExportSchema(ArticleFilterSchema):
+    """
+    The export's query string: the list filters plus ``after``, the last id
+    already exported when resuming.
+    """
+
+    after = fields.Integer(validate=validate.Range(min=0))
+
+    @post_load
+    def to_filters(self, data, *args, **kwargs):
+        filters = super().to_filters(data)
+        if "after" in data:
+            filters["pk__gt"] = data["after"]
+        return filters
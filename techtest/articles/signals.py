@@ -0,0 +1,53 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from techtest.articles.models import Article, TableVersion
+from techtest.authors.models import Author
+from techtest.regions.models import Region
+
+
+def touch(article_ids, now=None):
+    Article.objects.filter(pk__in=list(article_ids)).update(
+        updated_at=now or timezone.now()
+    )
+
+
+def bump_version(model):
+    """Counts a delete from ``model``'s table, see ``TableVersion``."""
+    table = model._meta.db_table
+    versions = TableVersion.objects.filter(table=table)
+    if not versions.update(version=F("version") + 1):
+        TableVersion.objects.bulk_create(
+            [TableVersion(table=table, version=1)], ignore_conflicts=True
+        )
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def touch_articles_on_regions_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    # Changing the regions of an article is a change of the article
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        instance.updated_at = timezone.now()
+        touch([instance.pk], instance.updated_at)
+    elif action == "pre_clear":
+        touch(instance.articles.values_list("id", flat=True))
+    else:
+        touch(pk_set)
+
+
+@receiver(pre_delete, sender=Region)
+def touch_articles_on_region_delete(sender, instance, **kwargs):
+    # Deleting a region drops its article links without any m2m_changed
+    touch(instance.articles.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Region)
+def bump_version_on_delete(sender, **kwargs):
+    bump_version(sender)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from techtest.articles.models import Article
+from techtest.authors.models import Author
+from techtest.authors.schemas import AuthorSchema
+from techtest.regions.models import Region
+from techtest.regions.schemas import RegionSchema
+from techtest.schemas import dump, get_schema
+
+# With SNAPSHOTS on, every article keeps its dumped author and regions in
+# JSON columns that ArticleSchema dumps from instead of joining the author
+# and regions tables. Writes to an article, its regions, an author or a
+# region rewrite the snapshots they show up in.
+
+FIELDS = ["author_snapshot", "regions_snapshot"]
+
+
+def dump_author(author):
+    return None if author is None else dump(get_schema(AuthorSchema), author)
+
+
+def build(article, regions=None):
+    """The snapshot columns of ``article``, from its loaded author and regions."""
+    if regions is None:
+        regions = article.regions.all()
+    return {
+        "author_snapshot": dump_author(article.author),
+        "regions_snapshot": dump(get_schema(RegionSchema), regions, many=True),
+    }
+
+
+def refresh(articles, batch_size=1000):
+    """Rebuilds the snapshots of the ``articles`` queryset."""
+    articles = articles.select_related("author").prefetch_related("regions")
+    last_pk = 0
+    while True:
+        batch = list(articles.filter(pk__gt=last_pk).order_by("pk")[:batch_size])
+        if not batch:
+            return
+        for article in batch:
+            for name, value in build(article).items():
+                setattr(article, name, value)
+        Article.objects.bulk_update(batch, FIELDS)
+        last_pk = batch[-1].pk
+
+
+def save(article, regions=None):
+    snapshot = build(article, regions)
+    current = {name: article.__dict__.get(name, ()) for name in FIELDS}
+    if snapshot != current:
+        article.__dict__.update(snapshot)
+        Article.objects.filter(pk=article.pk).update(**snapshot)
+
+
+@receiver(post_save, sender=Article)
+def save_article_snapshot(sender, instance, created, **kwargs):
+    if settings.SNAPSHOTS:
+        # A new article has no regions yet, adding them sends m2m_changed
+        save(instance, [] if created else None)
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def save_regions_snapshot(sender, instance, action, reverse, pk_set, **kwargs):
+    if not settings.SNAPSHOTS:
+        return
+    if action == "pre_clear" and reverse:
+        instance._snapshot_article_ids = list(
+            instance.articles.values_list("id", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            # The relation's prefetched regions are stale
+            getattr(instance, "_prefetched_objects_cache", {}).pop("regions", None)
+            save(instance)
+        elif action == "post_clear":
+            refresh(Article.objects.filter(pk__in=instance._snapshot_article_ids))
+        else:
+            refresh(Article.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Author)
+def save_author_snapshots(sender, instance, created, **kwargs):
+    if settings.SNAPSHOTS and not created:
+        # Every article of the author shows the same author, one UPDATE
+        Article.objects.filter(author=instance).update(
+            author_snapshot=dump_author(instance)
+        )
+
+
+@receiver(post_save, sender=Region)
+def save_region_snapshots(sender, instance, created, **kwargs):
+    if settings.SNAPSHOTS and not created:
+        refresh(Article.objects.filter(regions=instance))
+
+
+@receiver(pre_delete, sender=Region)
+def remember_region_articles(sender, instance, **kwargs):
+    if settings.SNAPSHOTS:
+        # The links are gone by post_delete
+        instance._snapshot_article_ids = list(
+            instance.articles.values_list("id", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Region)
+def save_deleted_region_snapshots(sender, instance, **kwargs):
+    if settings.SNAPSHOTS:
+        refresh(Article.objects.filter(pk__in=instance._snapshot_article_ids))
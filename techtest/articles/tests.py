@@ -1,11 +1,19 @@
+import gzip
+import io
 import json
+import tempfile
+from unittest import mock
 
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import techtest.factories as f
-from techtest.articles.models import Article
+from techtest.articles.models import Article, RenderedArticle
 from techtest.regions.models import Region
+from techtest.testing import QueryCountMixin
 
 
 class ArticleListViewTestCase(TestCase):
@@ -276,3 +284,872 @@ class ArticleViewTestCase(TestCase):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Article.objects.count(), 0)
+
+
+class ArticlePatchTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.region = f.RegionFactory(code="AL")
+        self.article = f.ArticleFactory(title="Title", content="Content")
+        self.article.regions.set([self.region])
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def patch(self, payload):
+        return self.client.patch(
+            self.url, data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_updates_only_sent_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.patch({"title": "New title"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "New title")
+        self.assertEqual(response.json()["content"], "Content")
+        self.assertEqual(response.json()["regions"][0]["id"], self.region.id)
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('SET "title"', updates[0])
+        self.assertNotIn('"content"', updates[0])
+        self.assertNotIn('"author_id"', updates[0])
+        # No author lookup: the article, its regions, then the writes
+        self.assertFalse(
+            [
+                query
+                for query in context.captured_queries
+                if 'FROM "authors_author" WHERE' in query["sql"]
+            ]
+        )
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.title, "New title")
+
+    def test_patches_author_and_regions(self):
+        author = f.AuthorFactory()
+        response = self.patch({"author_id": author.id, "regions": []})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["author"]["id"], author.id)
+        self.assertEqual(response.json()["regions"], [])
+        self.assertEqual(response.json()["title"], "Title")
+
+    def test_validates_sent_fields(self):
+        response = self.patch({"title": "x" * 256, "author_id": 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"title", "author_id"})
+
+
+class ArticleQueryCountTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.codes = iter("%s%s" % (a, b) for a in "ABCDEFGH" for b in "ABCDEFGH")
+
+    def create_articles(self, count=5):
+        for _ in range(count):
+            article = f.ArticleFactory()
+            article.regions.set(
+                [f.RegionFactory(code=next(self.codes)) for _ in range(2)]
+            )
+
+    def test_list_query_count_does_not_grow_with_articles(self):
+        url = reverse("articles-list")
+        count = self.assertConstantQueries(
+            lambda: self.client.get(url), self.create_articles
+        )
+        # ETag state, articles joined with their authors, then all regions
+        self.assertEqual(count, 3)
+
+    def test_detail_query_count_does_not_grow_with_regions(self):
+        article = f.ArticleFactory()
+        url = reverse("article", kwargs={"article_id": article.id})
+
+        def add_regions():
+            article.regions.add(
+                *[f.RegionFactory(code=next(self.codes)) for _ in range(3)]
+            )
+
+        count = self.assertConstantQueries(lambda: self.client.get(url), add_regions)
+        self.assertEqual(count, 2)
+
+    def test_update_query_counts(self):
+        author = f.AuthorFactory()
+        regions = [f.RegionFactory(code=next(self.codes)) for _ in range(3)]
+        article = f.ArticleFactory(author=author, content="Content")
+        article.regions.set(regions[:2])
+        url = reverse("article", kwargs={"article_id": article.id})
+
+        def put(**changes):
+            payload = {
+                "title": article.title,
+                "content": "Content",
+                "author_id": author.id,
+                "regions": [{"id": region.id} for region in regions[:2]],
+            }
+            payload.update(changes)
+            response = self.client.put(
+                url, data=json.dumps(payload), content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 200)
+
+        # The article with its author, its regions, and a savepoint around
+        # the writes: nothing to write
+        self.assertEqual(self.count_queries(put), 4)
+        # UPDATE of the title, then the search index entry
+        self.assertEqual(self.count_queries(put, title="New"), 7)
+        # The new region, one DELETE and one INSERT of links, then UPDATE of
+        # updated_at
+        regions_payload = [{"id": regions[0].id}, {"id": regions[2].id}]
+        self.assertEqual(
+            self.count_queries(put, title="New", regions=regions_payload), 8
+        )
+        response = self.client.get(url)
+        self.assertEqual(
+            [region["id"] for region in response.json()["regions"]],
+            [regions[0].id, regions[2].id],
+        )
+
+
+class ArticleBulkViewTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.url = reverse("articles-bulk")
+        self.author = f.AuthorFactory()
+        self.region = Region.objects.create(code="AL", name="Albania")
+
+    def post(self, payload):
+        return self.client.post(
+            self.url, data=json.dumps(payload), content_type="application/json"
+        )
+
+    def payload(self, count):
+        return [
+            {
+                "title": "Article %s" % i,
+                "content": "Content %s" % i,
+                "author_id": self.author.id,
+                "regions": [{"id": self.region.id}, {"code": "UK", "name": "UK"}],
+            }
+            for i in range(count)
+        ]
+
+    def test_creates_and_updates_articles(self):
+        article = f.ArticleFactory()
+        article.regions.set([self.region])
+        payload = self.payload(2) + [
+            {
+                "id": article.id,
+                "title": "Updated",
+                "author_id": self.author.id,
+                "regions": [{"code": "US", "name": "United States of America"}],
+            }
+        ]
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(
+            [item["title"] for item in data][:2], ["Article 0", "Article 1"]
+        )
+        self.assertEqual(data[2]["id"], article.id)
+        self.assertEqual(Article.objects.count(), 3)
+        # Regions are reused by code and only created once
+        self.assertEqual(Region.objects.count(), 3)
+        uk = Region.objects.get(code="UK")
+        for item in data[:2]:
+            self.assertCountEqual(
+                [region["id"] for region in item["regions"]], [self.region.id, uk.id]
+            )
+            self.assertEqual(item["author"]["id"], self.author.id)
+        article.refresh_from_db()
+        self.assertEqual(article.title, "Updated")
+        self.assertEqual(article.author, self.author)
+        self.assertEqual(list(article.regions.values_list("code", flat=True)), ["US"])
+
+    def test_reports_errors_per_item_and_writes_nothing(self):
+        payload = self.payload(3)
+        payload[1]["author_id"] = 0
+        payload[2]["regions"] = [{"id": 0}]
+        payload.append({"id": 0, "title": "Missing", "author_id": self.author.id})
+        response = self.post(payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(),
+            {
+                "1": {"author_id": ["Invalid author id."]},
+                "2": {"regions": ["Invalid region id."]},
+                "3": {"id": ["No Article matches the given query"]},
+            },
+        )
+        self.assertEqual(Article.objects.count(), 0)
+        self.assertEqual(Region.objects.count(), 1)
+
+    def test_rejects_non_list_payload(self):
+        response = self.post({"title": "Not a list"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_malformed_json(self):
+        response = self.client.post(
+            self.url, data="[{not json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid JSON", response.json()["error"])
+
+    def test_creates_row_by_row_without_sqlite_id_ranges(self):
+        # Backends that interleave concurrent inserts (MySQL) get each id from
+        # its own INSERT instead of the range above the max id
+        f.ArticleFactory()
+        with mock.patch.object(connection, "vendor", "mysql"):
+            response = self.post(self.payload(3))
+        self.assertEqual(response.status_code, 201)
+        articles = Article.objects.filter(pk__in=[a["id"] for a in response.json()])
+        self.assertEqual(
+            sorted(article.title for article in articles),
+            ["Article 0", "Article 1", "Article 2"],
+        )
+        for article in articles:
+            self.assertEqual(
+                sorted(article.regions.values_list("code", flat=True)), ["AL", "UK"]
+            )
+
+    def test_query_count_does_not_grow_with_payload(self):
+        Region.objects.create(code="UK", name="UK")
+        small = self.count_queries(self.post, self.payload(5))
+        large = self.count_queries(self.post, self.payload(50))
+        self.assertEqual(small, large)
+
+
+class ArticleConditionalRequestTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.article = f.ArticleFactory()
+        self.region = f.RegionFactory()
+        self.article.regions.set([self.region])
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+        self.list_url = reverse("articles-list")
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_detail_returns_304_without_serializing(self):
+        response = self.client.get(self.url)
+        self.assertIn("Last-Modified", response)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            self.client.get(
+                self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            ).status_code,
+            304,
+        )
+
+    def test_detail_etag_changes_with_nested_objects(self):
+        etag = self.get_etag(self.url)
+        self.article.author.first_name = "Renamed"
+        self.article.author.save()
+        self.assertNotEqual(self.get_etag(self.url), etag)
+
+        etag = self.get_etag(self.url)
+        self.region.name = "Renamed"
+        self.region.save()
+        self.assertNotEqual(self.get_etag(self.url), etag)
+
+        etag = self.get_etag(self.url)
+        self.article.regions.clear()
+        self.assertNotEqual(self.get_etag(self.url), etag)
+
+    def test_list_etag_changes_with_any_table(self):
+        etag = self.get_etag(self.list_url)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.get_etag(self.list_url + "?page_size=1"), etag)
+        self.region.delete()
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+
+        etag = self.get_etag(self.list_url)
+        f.ArticleFactory()
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+
+    def test_list_etag_changes_on_deletes_without_counting_rows(self):
+        newer = f.ArticleFactory()
+        author = f.AuthorFactory()
+        with CaptureQueriesContext(connection) as context:
+            etag = self.get_etag(self.list_url)
+        self.assertNotIn("COUNT", context.captured_queries[0]["sql"])
+        # Neither delete moves the max updated_at of its table
+        self.article.delete()
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+        etag = self.get_etag(self.list_url)
+        self.client.delete(reverse("author", kwargs={"author_id": author.id}))
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+        etag = self.get_etag(self.list_url)
+        self.client.delete(reverse("author", kwargs={"author_id": newer.author_id}))
+        self.assertNotEqual(self.get_etag(self.list_url), etag)
+
+    def test_if_match_prevents_lost_updates(self):
+        etag = self.get_etag(self.url)
+        payload = {"title": "First", "author_id": self.article.author.id}
+        response = self.client.put(
+            self.url,
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+        payload["title"] = "Second"
+        response = self.client.put(
+            self.url,
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 412)
+        response = self.client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.title, "First")
+
+
+class ArticleSparseFieldsTestCase(TestCase):
+    def setUp(self):
+        self.region = f.RegionFactory(code="AL", name="Albania")
+        self.article = f.ArticleFactory(title="Title", content="Content")
+        self.article.regions.set([self.region])
+        self.list_url = reverse("articles-list")
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def get_json(self, url, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        return response, [query["sql"] for query in context.captured_queries]
+
+    def test_list_selects_only_requested_columns(self):
+        response, queries = self.get_json(self.list_url, {"fields": "id,title"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [{"id": self.article.id, "title": "Title"}])
+        # ETag state and the articles, no author join and no region prefetch
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("content", queries[-1])
+        self.assertNotIn("authors_author", queries[-1])
+
+    def test_nested_fields(self):
+        author = self.article.author
+        response, queries = self.get_json(
+            self.list_url, {"fields": "title,author", "fields[author]": "first_name"}
+        )
+        self.assertEqual(
+            response.json(),
+            [{"title": "Title", "author": {"first_name": author.first_name}}],
+        )
+        self.assertEqual(len(queries), 2)
+        self.assertIn("authors_author", queries[-1])
+        self.assertNotIn("last_name", queries[-1])
+
+        response, _ = self.get_json(self.url, {"fields[author]": "id"})
+        self.assertEqual(
+            response.json(),
+            {
+                "id": self.article.id,
+                "title": "Title",
+                "content": "Content",
+                "author": {"id": author.id},
+                "regions": [{"id": self.region.id, "code": "AL", "name": "Albania"}],
+            },
+        )
+
+    def test_stream_and_detail(self):
+        response = self.client.get(self.list_url, {"stream": 1, "fields": "regions"})
+        self.assertEqual(
+            json.loads(b"".join(response.streaming_content)),
+            [{"regions": [{"id": self.region.id, "code": "AL", "name": "Albania"}]}],
+        )
+        response = self.client.get(self.url, {"fields": "id,content"})
+        self.assertEqual(response.json(), {"id": self.article.id, "content": "Content"})
+
+    def test_invalid_fields(self):
+        for params in [
+            {"fields": "id,nope"},
+            {"fields": ""},
+            {"fields[regions]": "code"},
+            {"fields": "id", "fields[author]": "id"},
+            {"fields[author]": "nope"},
+        ]:
+            for url in [self.list_url, self.url]:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400, params)
+
+
+class ArticleFilterTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.author = f.AuthorFactory()
+        self.region = f.RegionFactory(code="AL")
+        self.first = f.ArticleFactory(title="Apple pie", author=self.author)
+        self.second = f.ArticleFactory(title="apple tart")
+        self.third = f.ArticleFactory(title="Apricot jam", author=self.author)
+        self.second.regions.set([self.region, f.RegionFactory(code="BE")])
+        self.third.regions.set([self.region])
+
+    def get_ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [article["id"] for article in response.json()]
+
+    def test_filters(self):
+        self.assertEqual(
+            self.get_ids({"author_id": self.author.id}), [self.first.id, self.third.id]
+        )
+        self.assertEqual(
+            self.get_ids({"region": "AL"}), [self.second.id, self.third.id]
+        )
+        self.assertEqual(
+            self.get_ids({"title__startswith": "Ap"}), [self.first.id, self.third.id]
+        )
+        self.assertEqual(self.get_ids({"title__startswith": "App"}), [self.first.id])
+        self.assertEqual(
+            self.get_ids({"author_id": self.author.id, "region": "AL"}),
+            [self.third.id],
+        )
+        self.assertEqual(self.get_ids({"region": "ZZ"}), [])
+
+    def test_title_prefix_ending_before_surrogates(self):
+        article = f.ArticleFactory(title="Ab\ud7ff\ud7ffc")
+        f.ArticleFactory(title="Ab\ue000")
+        self.assertEqual(self.get_ids({"title__startswith": "Ab\ud7ff"}), [article.id])
+        self.assertEqual(self.get_ids({"title__startswith": "\U0010ffff"}), [])
+
+    def test_filters_with_pagination(self):
+        response = self.client.get(self.url, {"region": "AL", "page_size": 1})
+        self.assertEqual(response.json()[0]["id"], self.second.id)
+        self.assertIn("region=AL", response["Link"])
+        next_url = response["Link"].split(">")[0].lstrip("<")
+        response = self.client.get(next_url)
+        self.assertEqual([a["id"] for a in response.json()], [self.third.id])
+
+    def test_invalid_filters(self):
+        response = self.client.get(self.url, {"author_id": "abc", "region": "ALB"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"author_id", "region"})
+
+
+class ArticleSearchTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-search")
+        self.in_content = f.ArticleFactory(
+            title="Weather", content="Heavy rain in Paris today"
+        )
+        self.in_title = f.ArticleFactory(title="Paris rain", content="Wet")
+        self.other = f.ArticleFactory(title="Berlin", content="Sunny")
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, dict(params, q=q))
+        self.assertEqual(response.status_code, 200)
+        return [article["id"] for article in response.json()]
+
+    def test_ranks_title_matches_first(self):
+        for backend in ["fts5", "like"]:
+            with self.settings(SEARCH_BACKEND=backend):
+                self.assertEqual(
+                    self.search("paris RAIN"), [self.in_title.id, self.in_content.id]
+                )
+                self.assertEqual(self.search("rain berlin"), [])
+
+    def test_index_follows_changes(self):
+        self.other.content = "Rain in the afternoon"
+        self.other.save()
+        self.in_title.delete()
+        self.assertEqual(self.search("rain"), [self.other.id, self.in_content.id])
+
+        response = self.client.post(
+            reverse("articles-bulk"),
+            data=json.dumps(
+                [
+                    {"title": "Bulk rain", "author_id": self.other.author.id},
+                    {
+                        "id": self.other.id,
+                        "title": "Berlin",
+                        "content": "Sunny",
+                        "author_id": self.other.author.id,
+                    },
+                ]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        created_id = response.json()[0]["id"]
+        self.assertEqual(self.search("rain"), [created_id, self.in_content.id])
+
+    def test_pagination(self):
+        response = self.client.get(self.url, {"q": "rain", "page_size": 1})
+        self.assertEqual(response.json()[0]["id"], self.in_title.id)
+        next_url = response["Link"].split(">")[0].lstrip("<")
+        response = self.client.get(next_url)
+        self.assertEqual([a["id"] for a in response.json()], [self.in_content.id])
+        self.assertIn('rel="prev"', response["Link"])
+        self.assertNotIn('rel="next"', response["Link"])
+
+    def test_invalid_queries(self):
+        for params in [{}, {"q": " !? "}, {"q": "rain", "cursor": "nope"}]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+        # FTS5 syntax is searched for literally
+        self.assertEqual(self.search('"rain" OR NEAR(x'), [])
+
+
+@override_settings(SNAPSHOTS=True)
+class ArticleSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("articles-list")
+        self.author = f.AuthorFactory()
+        self.regions = f.RegionFactory.create_batch(2)
+        self.article = f.ArticleFactory(author=self.author)
+        self.article.regions.set(self.regions)
+        f.ArticleFactory(author=None)
+
+    def get(self, url=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        # The ETag's table stats and the articles, nothing joined
+        self.assertEqual(len(queries), 2)
+        for query in queries.captured_queries[1:]:
+            self.assertNotIn('"authors_author"', query["sql"])
+            self.assertNotIn('"regions_region"', query["sql"])
+        return response.json()
+
+    def assertMatchesRelations(self, url=None):
+        with override_settings(SNAPSHOTS=False):
+            expected = self.client.get(url or self.url).json()
+        self.assertEqual(self.get(url), expected)
+
+    def test_lists_render_without_joins(self):
+        self.assertMatchesRelations()
+        self.assertMatchesRelations(self.url + "?fields=id,author&fields[author]=id")
+        self.assertMatchesRelations(self.url + "?fields=id,regions")
+
+    def test_follows_writes_to_authors_and_regions(self):
+        self.author.first_name = "Renamed"
+        self.author.save()
+        self.regions[0].name = "Renamed"
+        self.regions[0].save()
+        self.assertMatchesRelations()
+        self.regions[1].delete()
+        self.assertMatchesRelations()
+        region = f.RegionFactory()
+        region.articles.add(self.article)
+        self.assertMatchesRelations()
+        region.articles.clear()
+        self.assertMatchesRelations()
+
+    def test_follows_article_writes(self):
+        url = reverse("article", kwargs={"article_id": self.article.id})
+        other = f.AuthorFactory()
+        payload = {
+            "title": "New",
+            "author_id": other.id,
+            "regions": [{"id": self.regions[1].id}, {"code": "ZZ", "name": "Zed"}],
+        }
+        response = self.client.put(url, payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesRelations()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.author_snapshot["id"], other.id)
+        self.article.regions.remove(self.regions[1])
+        self.assertMatchesRelations()
+
+        response = self.client.post(
+            reverse("articles-bulk"),
+            json.dumps(
+                [
+                    {
+                        "title": "Bulk",
+                        "author_id": other.id,
+                        "regions": [{"code": "AL"}],
+                    },
+                    {
+                        "id": self.article.id,
+                        "title": "Bulk",
+                        "author_id": self.author.id,
+                    },
+                ]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertMatchesRelations()
+
+    def test_falls_back_to_relations_until_refreshed(self):
+        with override_settings(SNAPSHOTS=False):
+            f.ArticleFactory(author=self.author).regions.set(self.regions)
+        self.assertEqual(
+            Article.objects.filter(author_snapshot__isnull=True).count(), 2
+        )
+        with override_settings(SNAPSHOTS=False):
+            expected = self.client.get(self.url).json()
+        self.assertEqual(self.client.get(self.url).json(), expected)
+        call_command("refresh_snapshots")
+        self.assertMatchesRelations()
+
+
+@override_settings(MATERIALIZED_RESPONSES=True)
+class RenderedArticleTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.article = f.ArticleFactory()
+        self.article.regions.set(f.RegionFactory.create_batch(2))
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def assertRenders(self, url=None):
+        url = url or self.url
+        with override_settings(MATERIALIZED_RESPONSES=False):
+            expected = self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response["ETag"], expected["ETag"])
+        self.assertEqual(response["Last-Modified"], expected["Last-Modified"])
+        return response
+
+    def test_serves_rendering_stored_on_write(self):
+        self.assertTrue(RenderedArticle.objects.filter(pk=self.article.pk).exists())
+        payload = {"title": "New", "author_id": self.article.author_id}
+        self.client.put(self.url, json.dumps(payload), content_type="application/json")
+        self.assertEqual(self.count_queries(self.client.get, self.url), 1)
+        response = self.assertRenders()
+        self.assertEqual(response.json()["title"], "New")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        # Sparse fieldsets are rendered per request
+        self.assertRenders(self.url + "?fields=id")
+
+    def test_misses_are_served_without_storing(self):
+        # A GET can't tell whether a write dropped the rendering after its
+        # reads, storing what it read could bring back a stale body
+        RenderedArticle.objects.all().delete()
+        self.assertRenders()
+        self.assertFalse(RenderedArticle.objects.exists())
+        payload = {"title": "New", "author_id": self.article.author_id}
+        self.client.put(self.url, json.dumps(payload), content_type="application/json")
+        self.assertTrue(RenderedArticle.objects.filter(pk=self.article.pk).exists())
+        self.assertEqual(self.count_queries(self.client.get, self.url), 1)
+
+    def test_author_and_region_writes_drop_renderings(self):
+        author = self.article.author
+        author.first_name = "Renamed"
+        author.save()
+        self.assertFalse(RenderedArticle.objects.exists())
+        self.assertEqual(self.assertRenders().json()["author"]["first_name"], "Renamed")
+        region = self.article.regions.first()
+        region.delete()
+        self.assertFalse(RenderedArticle.objects.exists())
+        self.assertEqual(len(self.assertRenders().json()["regions"]), 1)
+
+    def test_deleting_author_drops_renderings(self):
+        self.client.delete(
+            reverse("author", kwargs={"author_id": self.article.author_id})
+        )
+        self.assertFalse(RenderedArticle.objects.exists())
+
+    def test_render_articles_command(self):
+        other = f.ArticleFactory()
+        RenderedArticle.objects.all().delete()
+        call_command("render_articles", processes=1, batch_size=1, stdout=io.StringIO())
+        self.assertEqual(
+            set(RenderedArticle.objects.values_list("pk", flat=True)),
+            {self.article.pk, other.pk},
+        )
+        self.assertRenders()
+
+
+@override_settings(STREAMING_CHUNK_SIZE=2)
+class ArticleExportTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.url = reverse("articles-export")
+        self.articles = f.ArticleFactory.create_batch(5)
+        self.articles[0].regions.set(f.RegionFactory.create_batch(2))
+
+    def lines(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return self.lines(b"".join(response.streaming_content))
+
+    def test_streams_every_article_in_id_order(self):
+        with override_settings(PAGINATION_PAGE_SIZE=10):
+            expected = self.client.get(reverse("articles-list")).json()
+        self.assertEqual(self.export(), sorted(expected, key=lambda a: a["id"]))
+
+    @override_settings(STREAMING_CHUNK_SIZE=100)
+    def test_prefetches_regions_per_chunk(self):
+        def export():
+            b"".join(self.client.get(self.url).streaming_content)
+
+        def grow():
+            f.ArticleFactory().regions.set(f.RegionFactory.create_batch(2))
+
+        self.assertConstantQueries(export, grow)
+
+    def test_resumes_after_id(self):
+        after = self.articles[2].id
+        self.assertEqual(
+            [article["id"] for article in self.export(after=after)],
+            [article.id for article in self.articles[3:]],
+        )
+        self.assertEqual(
+            self.export(fields="id", author_id=self.articles[4].author_id),
+            [{"id": self.articles[4].id}],
+        )
+        self.assertEqual(self.client.get(self.url, {"after": -1}).status_code, 400)
+
+    def test_gzips_when_accepted(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(self.lines(content), self.export())
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson.gz") as output:
+            call_command("export_articles", output=output.name, gzip=True, chunk_size=2)
+            # Resuming appends the rest to the same file
+            call_command(
+                "export_articles",
+                output=output.name,
+                gzip=True,
+                after=self.articles[2].id,
+            )
+            with gzip.open(output.name) as exported:
+                ids = [article["id"] for article in self.lines(exported.read())]
+        article_ids = [article.id for article in self.articles]
+        self.assertEqual(ids, article_ids + article_ids[3:])
+
+
+class ArticleImportTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.author = f.AuthorFactory()
+        self.region = f.RegionFactory(code="AL")
+
+    def write(self, content, suffix=".ndjson"):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix)
+        file.write(content)
+        file.flush()
+        self.addCleanup(file.close)
+        return file.name
+
+    def ndjson(self, items):
+        return "".join(json.dumps(item) + "\n" for item in items)
+
+    def import_articles(self, *args, **options):
+        stdout = io.StringIO()
+        call_command("import_articles", *args, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_imports_ndjson(self):
+        items = [
+            {
+                "title": "Article %s" % i,
+                "content": "Content",
+                "author_id": self.author.id,
+                "regions": [{"code": "AL"}, {"code": "NW", "name": "New"}],
+            }
+            for i in range(5)
+        ]
+        output = self.import_articles(self.write(self.ndjson(items)), batch_size=2)
+        self.assertIn("Imported 5 articles", output)
+        self.assertIn("rows/s", output)
+        articles = Article.objects.order_by("pk")
+        self.assertEqual([a.title for a in articles], [i["title"] for i in items])
+        self.assertEqual(Region.objects.filter(code="NW").count(), 1)
+        for article in articles:
+            self.assertEqual(article.author, self.author)
+            self.assertEqual(
+                sorted(r.code for r in article.regions.all()), ["AL", "NW"]
+            )
+
+    def test_reimports_exported_articles(self):
+        article = f.ArticleFactory(author=self.author)
+        article.regions.set([self.region])
+        with tempfile.NamedTemporaryFile(suffix=".ndjson.gz") as output:
+            call_command("export_articles", output=output.name, gzip=True)
+            Article.objects.filter(pk=article.pk).update(title="Changed")
+            self.import_articles(output.name)
+        article.refresh_from_db()
+        self.assertEqual(Article.objects.count(), 1)
+        self.assertNotEqual(article.title, "Changed")
+
+    def test_restores_export_into_empty_tables(self):
+        articles = f.ArticleFactory.create_batch(3, author=self.author)
+        other = f.RegionFactory(code="OT")
+        articles[0].regions.set([self.region, other])
+        articles[1].regions.set([other])
+        with tempfile.NamedTemporaryFile(suffix=".ndjson.gz") as output:
+            call_command("export_articles", output=output.name, gzip=True)
+            Article.objects.all().delete()
+            # One region is gone, the other was recreated with another id
+            Region.objects.all().delete()
+            recreated = f.RegionFactory(code="OT")
+            output_text = self.import_articles(output.name)
+        self.assertIn("Imported 3 articles", output_text)
+        restored = Article.objects.order_by("pk")
+        self.assertEqual(
+            [(a.pk, a.title, a.author_id) for a in restored],
+            [(a.pk, a.title, a.author_id) for a in articles],
+        )
+        self.assertEqual(
+            sorted(r.code for r in restored[0].regions.all()), ["AL", "OT"]
+        )
+        self.assertEqual(list(restored[1].regions.all()), [recreated])
+        self.assertEqual(Region.objects.filter(code="AL").count(), 1)
+        # New articles get ids after the restored ones
+        self.assertGreater(f.ArticleFactory().pk, articles[-1].pk)
+
+    def test_imports_csv(self):
+        content = (
+            "id,title,content,author_id,regions\n"
+            ",First,Content,%s,AL NW\n"
+            ",Second,Content,%s,\n" % (self.author.id, self.author.id)
+        )
+        self.import_articles(self.write(content, suffix=".csv"))
+        first, second = Article.objects.order_by("pk")
+        self.assertEqual(first.author, self.author)
+        self.assertEqual(sorted(r.code for r in first.regions.all()), ["AL", "NW"])
+        self.assertEqual(second.author, self.author)
+        self.assertEqual(list(second.regions.all()), [])
+
+    def test_reads_stdin(self):
+        content = self.ndjson(
+            [{"title": "Piped", "content": "Content", "author_id": self.author.id}]
+        )
+        stdin = io.TextIOWrapper(io.BytesIO(content.encode()))
+        with mock.patch("sys.stdin", stdin):
+            self.import_articles("-")
+        self.assertEqual(Article.objects.get().title, "Piped")
+
+    def test_queries_per_batch_are_constant(self):
+        def items(count):
+            return [
+                {
+                    "title": "Article",
+                    "content": "Content",
+                    "author_id": self.author.id,
+                    "regions": [{"code": "AL"}],
+                }
+            ] * count
+
+        with CaptureQueriesContext(connection) as small:
+            self.import_articles(self.write(self.ndjson(items(2))))
+        with CaptureQueriesContext(connection) as large:
+            self.import_articles(self.write(self.ndjson(items(50))))
+        self.assertEqual(len(small), len(large))
+
+    def test_reports_lines_of_invalid_articles(self):
+        valid = {"title": "Valid", "content": "Content", "author_id": self.author.id}
+        items = [valid, valid, valid, dict(valid, author_id=0)]
+        with self.assertRaisesMessage(CommandError, "line 3") as raised:
+            self.import_articles(self.write(self.ndjson(items)), batch_size=2)
+        self.assertIn("4: {", str(raised.exception))
+        self.assertIn("author_id", str(raised.exception))
+        # Batches before the invalid one are committed
+        self.assertEqual(Article.objects.count(), 2)
+
+        path = self.write(self.ndjson(items[:1]) + "{not json\n")
+        with self.assertRaisesMessage(CommandError, "Line 2: invalid JSON"):
+            self.import_articles(path)
@@ -1,48 +1,207 @@
-import json
+import functools
 
+from django.http.response import StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from marshmallow import ValidationError
 
+from techtest import codec
+from techtest.articles import rendering
 from techtest.articles.models import Article
-from techtest.articles.schemas import ArticleSchema
-from techtest.utils import json_response
+from techtest.articles.schemas import (
+    ArticleBulkSchema,
+    ArticleExportSchema,
+    ArticleFilterSchema,
+    ArticleSchema,
+)
+from techtest.authors.models import Author
+from techtest.cache import article_dependencies, cache_response, depends_on
+from techtest.pagination import InvalidPage, paginate_offset, paginated_response
+from techtest.regions.models import Region
+from techtest.schemas import dump, get_request_schema, get_schema
+from techtest.search import get_terms, search_articles
+from techtest.utils import (
+    AsyncViewMixin,
+    conditional,
+    iter_gzip,
+    iter_ndjson,
+    json_response,
+    optimize_queryset,
+    stream_json_response,
+    table_validators,
+)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("articles", "authors", "regions"), name="dispatch")
 class ArticlesListView(View):
+    def get_validators(self, request):
+        return table_validators(request, Article, Author, Region)
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(ArticleSchema().dump(Article.objects.all(), many=True))
+        try:
+            schema = get_request_schema(request, ArticleSchema)
+            filters = ArticleFilterSchema().load(request.GET.dict())
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        articles = optimize_queryset(Article.objects.filter(**filters), schema)
+        if "stream" in request.GET:
+            return stream_json_response(articles, schema)
+        return paginated_response(request, articles, schema)
 
     def post(self, request, *args, **kwargs):
         try:
-            article = ArticleSchema().load(json.loads(request.body))
+            article = ArticleSchema().load(codec.loads(request.body))
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        return json_response(dump(get_schema(ArticleSchema), article), 201)
+
+
+class ArticleExportView(View):
+    """
+    Streams every article as newline delimited JSON in id order, gzipped when
+    the client accepts it. An interrupted export resumes with ``?after=`` set
+    to the last id received.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            schema = get_request_schema(request, ArticleSchema)
+            filters = ArticleExportSchema().load(request.GET.dict())
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        articles = optimize_queryset(
+            Article.objects.filter(**filters).order_by("pk"), schema
+        )
+        content = iter_ndjson(articles, schema)
+        gzipped = bool(
+            re_accepts_gzip.search(request.headers.get("Accept-Encoding", ""))
+        )
+        response = StreamingHttpResponse(
+            iter_gzip(content) if gzipped else content,
+            content_type="application/x-ndjson",
+        )
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+
+@method_decorator(cache_response("articles", "authors", "regions"), name="dispatch")
+class ArticleSearchView(View):
+    def get_validators(self, request):
+        return table_validators(request, Article, Author, Region)
+
+    @conditional
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "")
+        if not get_terms(query):
+            return json_response({"q": ["Enter at least one word to search for."]}, 400)
+        try:
+            schema = get_request_schema(request, ArticleSchema)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(ArticleSchema().dump(article), 201)
+        articles = optimize_queryset(Article.objects.all(), schema)
+        try:
+            page = paginate_offset(
+                request, functools.partial(search_articles, articles, query)
+            )
+        except InvalidPage as e:
+            return json_response({"error": str(e)}, 400)
+        return json_response(
+            dump(schema, page.objects, many=True), headers=page.links(request)
+        )
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+class ArticlesBulkView(View):
+    def post(self, request, *args, **kwargs):
+        try:
+            data = codec.loads(request.body)
+        except ValueError as e:
+            return json_response({"error": "Invalid JSON (%s)." % e}, 400)
+        try:
+            articles = ArticleBulkSchema(many=True).load(data)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        schema = get_schema(ArticleSchema)
+        articles_by_id = optimize_queryset(Article.objects.all(), schema).in_bulk(
+            [article.id for article in articles]
+        )
+        return json_response(
+            dump(
+                schema, [articles_by_id[article.id] for article in articles], many=True
+            ),
+            201,
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("article:{article_id}"), name="dispatch")
 class ArticleView(View):
     def dispatch(self, request, article_id, *args, **kwargs):
+        response = rendering.get_response(request, article_id)
+        if response is not None:
+            return response
         try:
-            self.article = Article.objects.get(pk=article_id)
+            self.article = optimize_queryset(
+                Article.objects.all(), get_schema(ArticleSchema), only=False
+            ).get(pk=article_id)
         except Article.DoesNotExist:
             return json_response({"error": "No Article matches the given query"}, 404)
-        self.data = request.body and dict(json.loads(request.body), id=self.article.id)
+        self.data = request.body and dict(codec.loads(request.body), id=self.article.id)
         return super(ArticleView, self).dispatch(request, *args, **kwargs)
 
+    def get_validators(self, request):
+        return rendering.validators(self.article)
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(ArticleSchema().dump(self.article))
+        # Not stored: a write committing meanwhile could have dropped the
+        # rendering this would replace, only writes store them
+        try:
+            schema = get_request_schema(request, ArticleSchema)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        return depends_on(
+            json_response(dump(schema, self.article)),
+            *article_dependencies(
+                self.article.author_id,
+                [region.pk for region in self.article.regions.all()],
+            )
+        )
 
+    @conditional
     def put(self, request, *args, **kwargs):
+        return self.update(partial=False)
+
+    @conditional
+    def patch(self, request, *args, **kwargs):
+        return self.update(partial=True)
+
+    def update(self, partial):
+        schema = ArticleSchema(context={"instance": self.article}, partial=partial)
         try:
-            self.article = ArticleSchema().load(self.data)
+            self.article = schema.load(self.data)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(ArticleSchema().dump(self.article))
+        return json_response(dump(get_schema(ArticleSchema), self.article))
 
+    @conditional
     def delete(self, request, *args, **kwargs):
         self.article.delete()
         return json_response()
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncArticlesListView(AsyncViewMixin, ArticlesListView):
+    pass
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncArticleView(AsyncViewMixin, ArticleView):
+    pass
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import transaction
+
+from techtest import search
+from techtest.articles.models import Article, RenderedArticle
+from techtest.articles.signals import bump_version
+from techtest.authors.models import Author
+from techtest.cache import invalidate
+
+
+def delete_articles(article_ids):
+    """
+    Deletes the articles, their region links and renderings with one DELETE
+    each, without loading them or sending their model signals, so what the
+    signals would do is done here.
+    """
+    Through = Article.regions.through
+    Through.objects.filter(article_id__in=article_ids)._raw_delete(Through.objects.db)
+    RenderedArticle.objects.filter(article_id__in=article_ids)._raw_delete(
+        RenderedArticle.objects.db
+    )
+    deleted = Article.objects.filter(pk__in=article_ids)._raw_delete(Article.objects.db)
+    bump_version(Article)
+    search.get_backend().remove(article_ids)
+    invalidate("articles", *["article:%s" % article_id for article_id in article_ids])
+    return deleted
+
+
+def delete_authors(author_ids, batch_size=None):
+    """
+    Deletes the authors and their articles. ``Article.author`` cascades, but
+    Django's collector would load every article first; they are deleted
+    ``DELETE_BATCH_SIZE`` at a time instead, a transaction per batch so no
+    lock is held for long. Returns the number of authors deleted.
+    """
+    batch_size = batch_size or settings.DELETE_BATCH_SIZE
+    articles = Article.objects.filter(author_id__in=author_ids).order_by("id")
+    while True:
+        with transaction.atomic():
+            article_ids = list(articles.values_list("id", flat=True)[:batch_size])
+            if not article_ids:
+                break
+            delete_articles(article_ids)
+    # Articles added meanwhile are few, the regular cascade deletes them
+    deleted, counts = Author.objects.filter(pk__in=author_ids).delete()
+    return counts.get(Author._meta.label, 0)
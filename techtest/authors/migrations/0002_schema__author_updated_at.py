@@ -0,0 +1,22 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authors", "0001_schema__initial_model_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="author",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -4,3 +4,4 @@ from django.db import models
 class Author(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
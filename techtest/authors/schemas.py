@@ -2,6 +2,7 @@ from marshmallow import Schema, fields, validate
 from marshmallow.decorators import post_load
 
 from techtest.authors.models import Author
+from techtest.schemas import update_instance
 
 
 class AuthorSchema(Schema):
@@ -14,6 +15,12 @@ class AuthorSchema(Schema):
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
+        instance = self.context.get("instance")
+        if instance is not None and data.get("id") == instance.pk:
+            data.pop("id")
+            update_instance(instance, data)
+            return instance
+
         author, _ = Author.objects.update_or_create(
             id=data.pop("id", None), defaults=data
         )
@@ -1,9 +1,13 @@
 import json
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import techtest.factories as f
+from techtest import search
+from techtest.articles.models import Article
 from techtest.authors.models import Author
 from techtest.regions.models import Region
 
@@ -130,6 +134,53 @@ class AuthorUpdateTestCase(TestCase):
         assert "first_name" in response_data
         assert "last_name" in response_data
 
+    def test_update_writes_only_changed_fields(self):
+        author = f.AuthorFactory()
+        url = reverse("author", kwargs={"author_id": author.id})
+        payload = {"first_name": "user", "last_name": author.last_name}
+        with CaptureQueriesContext(connection) as context:
+            self.client.put(
+                url, data=json.dumps(payload), content_type="application/json"
+            )
+        # The author, then one UPDATE of the changed field
+        self.assertEqual(len(context.captured_queries), 2)
+        update = context.captured_queries[1]["sql"]
+        self.assertIn('"first_name"', update)
+        self.assertNotIn('"last_name"', update)
+        # Nothing left to write
+        with self.assertNumQueries(1):
+            self.client.put(
+                url, data=json.dumps(payload), content_type="application/json"
+            )
+
+
+class AuthorPatchTestCase(TestCase):
+    def test_updates_only_sent_fields(self):
+        author = f.AuthorFactory(first_name="First", last_name="Last")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                reverse("author", kwargs={"author_id": author.id}),
+                data=json.dumps({"last_name": "Other"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(
+            response.json(),
+            {"id": author.id, "first_name": "First", "last_name": "Other"},
+        )
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn('"first_name"', context.captured_queries[1]["sql"])
+
+    def test_validates_sent_fields(self):
+        author = f.AuthorFactory()
+        response = self.client.patch(
+            reverse("author", kwargs={"author_id": author.id}),
+            data=json.dumps({"first_name": "x" * 256}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("first_name", response.json())
+
 
 class AuthorDeleteTestCase(TestCase):
     def test_user_can_delete_author(self):
@@ -146,3 +197,74 @@ class AuthorDeleteTestCase(TestCase):
         self.assertEqual(
             response.json().get("error"), "No Author matches the given query"
         )
+
+
+class AuthorBulkDeleteTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("authors-list")
+
+    def create_articles(self, author, count):
+        Article.objects.bulk_create(
+            (Article(title="Article %s" % i, author=author) for i in range(count)),
+            batch_size=5000,
+        )
+        Through = Article.regions.through
+        region = f.RegionFactory()
+        Through.objects.bulk_create(
+            (
+                Through(article_id=pk, region_id=region.pk)
+                for pk in author.articles.values_list("id", flat=True)
+            ),
+            batch_size=5000,
+        )
+
+    @override_settings(DELETE_BATCH_SIZE=20000)
+    def test_deletes_prolific_author_in_batches(self):
+        author, other = f.AuthorFactory.create_batch(2)
+        self.create_articles(author, 100000)
+        kept = f.ArticleFactory(author=other, title="Kept")
+        search.get_backend().rebuild()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(
+                reverse("author", kwargs={"author_id": author.id})
+            )
+        self.assertEqual(response.status_code, 204)
+        # A few queries per batch of 20000 articles, none per article
+        self.assertLess(len(queries), 50)
+        self.assertEqual(list(Article.objects.all()), [kept])
+        self.assertEqual(Article.regions.through.objects.count(), 0)
+        self.assertFalse(Author.objects.filter(pk=author.pk).exists())
+        self.assertEqual(search.search_articles(Article.objects, "article", 0, 10), [])
+
+    def test_deletes_authors_by_ids(self):
+        authors = f.AuthorFactory.create_batch(3)
+        for author in authors:
+            self.create_articles(author, 10)
+        response = self.client.delete(
+            "%s?ids=%s,%s" % (self.url, authors[0].id, authors[1].id)
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Author.objects.all()), [authors[2]])
+        self.assertEqual(
+            set(Article.objects.values_list("author_id", flat=True)), {authors[2].id}
+        )
+
+    def test_rejects_unknown_or_invalid_ids(self):
+        author = f.AuthorFactory()
+        response = self.client.delete("%s?ids=%s,0" % (self.url, author.id))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["ids"], [0])
+        self.assertEqual(self.client.delete("%s?ids=1,x" % self.url).status_code, 400)
+        self.assertEqual(self.client.delete(self.url).status_code, 400)
+        self.assertTrue(Author.objects.filter(pk=author.pk).exists())
+
+    @override_settings(API_CACHE="api")
+    def test_invalidates_deleted_articles(self):
+        article = f.ArticleFactory()
+        url = reverse("article", kwargs={"article_id": article.id})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(self.client.get(reverse("articles-list")).json()), 1)
+        self.client.delete(reverse("author", kwargs={"author_id": article.author_id}))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse("articles-list")).json(), [])
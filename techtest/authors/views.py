@@ -1,48 +1,116 @@
-import json
-
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from marshmallow import ValidationError
 
+from techtest import codec
+from techtest.authors.deletion import delete_authors
 from techtest.authors.models import Author
 from techtest.authors.schemas import AuthorSchema
-from techtest.utils import json_response
+from techtest.cache import cache_response
+from techtest.pagination import paginated_response
+from techtest.schemas import dump, get_request_schema, get_schema
+from techtest.utils import (
+    AsyncViewMixin,
+    conditional,
+    json_response,
+    make_etag,
+    optimize_queryset,
+    stream_json_response,
+    table_validators,
+)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("authors"), name="dispatch")
 class AuthorsListView(View):
+    def get_validators(self, request):
+        return table_validators(request, Author)
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(AuthorSchema().dump(Author.objects.all(), many=True))
+        try:
+            schema = get_request_schema(request, AuthorSchema)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        authors = optimize_queryset(Author.objects.all(), schema)
+        if "stream" in request.GET:
+            return stream_json_response(authors, schema)
+        return paginated_response(request, authors, schema)
 
     def post(self, request, *args, **kwargs):
         try:
-            author = AuthorSchema().load(json.loads(request.body))
+            author = AuthorSchema().load(codec.loads(request.body))
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(AuthorSchema().dump(author), 201)
+        return json_response(dump(get_schema(AuthorSchema), author), 201)
+
+    def delete(self, request, *args, **kwargs):
+        try:
+            ids = {int(pk) for pk in request.GET.get("ids", "").split(",")}
+        except ValueError:
+            return json_response({"ids": ["Enter a comma separated list of ids."]}, 400)
+        missing = ids - set(
+            Author.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        if missing:
+            return json_response(
+                {"error": "No Author matches the given query", "ids": sorted(missing)},
+                404,
+            )
+        delete_authors(ids)
+        return json_response(status=204)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("author:{author_id}"), name="dispatch")
 class AuthorView(View):
     def dispatch(self, request, author_id, *args, **kwargs):
         try:
             self.author = Author.objects.get(pk=author_id)
         except Author.DoesNotExist:
             return json_response({"error": "No Author matches the given query"}, 404)
-        self.data = request.body and dict(json.loads(request.body), id=self.author.id)
+        self.data = request.body and dict(codec.loads(request.body), id=self.author.id)
         return super(AuthorView, self).dispatch(request, *args, **kwargs)
 
+    def get_validators(self, request):
+        return make_etag(self.author.pk, self.author.updated_at), self.author.updated_at
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(AuthorSchema().dump(self.author))
+        try:
+            schema = get_request_schema(request, AuthorSchema)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        return json_response(dump(schema, self.author))
 
+    @conditional
     def put(self, request, *args, **kwargs):
+        return self.update(partial=False)
+
+    @conditional
+    def patch(self, request, *args, **kwargs):
+        return self.update(partial=True)
+
+    def update(self, partial):
+        schema = AuthorSchema(context={"instance": self.author}, partial=partial)
         try:
-            self.author = AuthorSchema().load(self.data)
+            self.author = schema.load(self.data)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(AuthorSchema().dump(self.author))
+        return json_response(dump(get_schema(AuthorSchema), self.author))
 
+    @conditional
     def delete(self, request, *args, **kwargs):
-        self.author.delete()
+        delete_authors([self.author.pk])
         return json_response(status=204)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAuthorsListView(AsyncViewMixin, AuthorsListView):
+    pass
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAuthorView(AsyncViewMixin, AuthorView):
+    pass
@@ -0,0 +1,188 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.http.response import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+
+from techtest.articles.models import Article
+from techtest.authors.models import Author
+from techtest.db.router import reads_from_replicas
+from techtest.regions.models import Region
+
+# Every cached response is stored under the current versions of the things
+# it depends on, e.g. "articles" for the list or "article:1" for a detail.
+# Invalidating replaces the version, orphaning every response built on it.
+# Dependencies only known once the view ran (the author and regions an
+# article detail shows) are stored with the response and checked on a hit.
+
+
+def get_cache():
+    return caches[settings.API_CACHE] if settings.API_CACHE else None
+
+
+def _version_key(dependency):
+    return "api:version:%s" % dependency
+
+
+def get_versions(cache, dependencies):
+    keys = [_version_key(dependency) for dependency in dependencies]
+    versions = cache.get_many(keys)
+    # A fresh version must never match one handed out before, even if the
+    # old one was evicted, so it can't just restart from zero.
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*dependencies):
+    cache = get_cache()
+    if cache is None or not dependencies:
+        return
+    keys = [_version_key(dependency) for dependency in dependencies]
+
+    def bump():
+        cache.set_many({key: time.time_ns() for key in keys}, timeout=None)
+
+    bump()
+    # Readers may have cached the old rows until the write became visible
+    transaction.on_commit(bump)
+
+
+def cache_key(request, dependencies, versions):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    versions = ",".join("%s=%s" % item for item in zip(dependencies, versions))
+    digest = hashlib.md5(
+        ("%s?%s|%s" % (request.path, query, versions)).encode()
+    ).hexdigest()
+    return "api:response:%s" % digest
+
+
+def get_cached_response(request, dependencies, kwargs):
+    """
+    Returns the cache key of the request, None when it can't be cached, and
+    its cached response if there is one.
+    """
+    cache = get_cache()
+    if cache is None or request.method != "GET" or "stream" in request.GET:
+        return None, None
+
+    names = [dependency.format(**kwargs) for dependency in dependencies]
+    versions = get_versions(cache, names)
+    key = cache_key(request, names, versions)
+    cached = cache.get(key)
+    if cached is None:
+        # Versions are created when first asked for after an invalidation, a
+        # replica may not have the write yet shortly after that.
+        lag = settings.REPLICA_STICKY_SECONDS * 10**9
+        if reads_from_replicas() and max(versions) > time.time_ns() - lag:
+            return None, None
+        return key, None
+    content, headers, extra = cached
+    if extra and get_versions(cache, list(extra)) != list(extra.values()):
+        return key, None
+    return key, get_conditional_response(
+        request,
+        etag=headers.get("ETag"),
+        last_modified=parse_http_date_safe(headers.get("Last-Modified")),
+        response=HttpResponse(content, headers=headers),
+    )
+
+
+def depends_on(response, *dependencies):
+    """
+    Makes the cached copy of ``response`` also depend on ``dependencies``, for
+    what the view only found out while building it.
+    """
+    response.cache_dependencies = dependencies
+    return response
+
+
+def article_dependencies(author_id, region_ids):
+    # What an article's detail shows besides the article itself
+    dependencies = ["region:%s" % region_id for region_id in region_ids]
+    if author_id is not None:
+        dependencies.append("author:%s" % author_id)
+    return dependencies
+
+
+def store_response(key, response, started):
+    cache = get_cache()
+    extra = getattr(response, "cache_dependencies", ())
+    versions = get_versions(cache, extra)
+    # A version newer than the view's reads comes from a write it may not
+    # have seen (or replaced an evicted one)
+    if any(version >= started for version in versions):
+        return
+    cache.set(
+        key, (response.content, dict(response.items()), dict(zip(extra, versions)))
+    )
+
+
+def cache_response(*dependencies):
+    """
+    Caches successful GET responses of a view until one of ``dependencies``
+    is invalidated. Dependencies are formatted with the view's kwargs, e.g.
+    ``cache_response("article:{article_id}")``.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Async views look the response up before running the view
+            key, response = getattr(request, "cache_lookup", None) or (
+                get_cached_response(request, dependencies, kwargs)
+            )
+            if response is not None:
+                return response
+            started = time.time_ns()
+            response = view(request, *args, **kwargs)
+            if key and response.status_code == 200 and not response.streaming:
+                store_response(key, response, started)
+            return response
+
+        wrapper.cache_dependencies = dependencies
+        return wrapper
+
+    return decorator
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article(sender, instance, **kwargs):
+    invalidate("articles", "article:%s" % instance.pk)
+
+
+@receiver(m2m_changed, sender=Article.regions.through)
+def invalidate_article_regions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        article_ids = pk_set if reverse else [instance.pk]
+        invalidate(
+            "articles", *["article:%s" % article_id for article_id in article_ids]
+        )
+    elif action == "pre_clear":
+        # Details of the region's articles depend on the region
+        dependency = "region:%s" if reverse else "article:%s"
+        invalidate("articles", dependency % instance.pk)
+
+
+@receiver(post_save, sender=Author)
+@receiver(pre_delete, sender=Author)
+def invalidate_author(sender, instance, **kwargs):
+    # Details of the author's articles depend on "author:<id>"
+    invalidate("authors", "author:%s" % instance.pk, "articles")
+
+
+@receiver(post_save, sender=Region)
+@receiver(pre_delete, sender=Region)
+def invalidate_region(sender, instance, **kwargs):
+    # Details of the region's articles depend on "region:<id>"
+    invalidate("regions", "region:%s" % instance.pk, "articles")
@@ -0,0 +1,70 @@
+import functools
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+Codec = namedtuple("Codec", ["name", "dumps", "loads"])
+
+
+def _orjson():
+    import orjson
+
+    def dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    return dumps, orjson.loads
+
+
+def _ujson():
+    import ujson
+
+    def dumps(data):
+        return ujson.dumps(
+            data, ensure_ascii=False, escape_forward_slashes=False
+        ).encode()
+
+    return dumps, ujson.loads
+
+
+def _json():
+    import json
+
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(data):
+        return encoder.encode(data).encode()
+
+    return dumps, json.loads
+
+
+BACKENDS = {"orjson": _orjson, "ujson": _ujson, "json": _json}
+
+
+@functools.lru_cache(maxsize=None)
+def load_codec(name):
+    if name == "auto":
+        for candidate in ("orjson", "ujson"):
+            try:
+                return load_codec(candidate)
+            except ImportError:
+                pass
+        return load_codec("json")
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ImproperlyConfigured("Unknown JSON_CODEC %r" % name)
+    return Codec(name, *backend())
+
+
+def get_codec():
+    return load_codec(settings.JSON_CODEC)
+
+
+def dumps(data):
+    """Encodes ``data`` straight to UTF-8 JSON bytes."""
+    return get_codec().dumps(data)
+
+
+def loads(data):
+    return get_codec().loads(data)
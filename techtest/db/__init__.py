@@ -0,0 +1,107 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+ENGINES = {
+    "sqlite": "django.db.backends.sqlite3",
+    "postgresql": "django.db.backends.postgresql",
+    "mysql": "django.db.backends.mysql",
+}
+
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# writer, NORMAL sync is still safe in WAL mode, reads are memory mapped and
+# a writer waits for the lock instead of failing right away.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+
+
+def _flag(value):
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def database_config(environ, default_name):
+    """
+    A ``DATABASES`` entry from ``DATABASE_*`` environment variables, SQLite
+    at ``default_name`` when none are set. SQLite is tuned for concurrent
+    requests unless ``DATABASE_SQLITE_TUNING=0``: see ``SQLITE_PRAGMAS`` and
+    the ``techtest.db.sqlite3`` backend.
+
+    Connections persist for ``DATABASE_CONN_MAX_AGE`` seconds and are checked
+    before being reused by a request (``DATABASE_CONN_HEALTH_CHECKS``).
+    ``DATABASE_POOL=pgbouncer`` is for a transaction pooling PgBouncer in front
+    of PostgreSQL: the pooler owns the connections, so they are closed after
+    every request and server side cursors are disabled.
+    """
+    engine = environ.get("DATABASE_ENGINE", "sqlite")
+    config = {
+        "ENGINE": ENGINES.get(engine, engine),
+        "NAME": environ.get("DATABASE_NAME", default_name),
+        "CONN_MAX_AGE": int(environ.get("DATABASE_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": _flag(environ.get("DATABASE_CONN_HEALTH_CHECKS", "1")),
+    }
+    for key in ("USER", "PASSWORD", "HOST", "PORT"):
+        if "DATABASE_%s" % key in environ:
+            config[key] = environ["DATABASE_%s" % key]
+
+    pool = environ.get("DATABASE_POOL")
+    if pool == "pgbouncer":
+        config["CONN_MAX_AGE"] = 0
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+    elif pool:
+        raise ImproperlyConfigured("Unknown DATABASE_POOL %r" % pool)
+
+    if config["ENGINE"] == ENGINES["sqlite"]:
+        if _flag(environ.get("DATABASE_SQLITE_TUNING", "1")):
+            config["ENGINE"] = "techtest.db.sqlite3"
+            config["PRAGMAS"] = dict(SQLITE_PRAGMAS)
+    return config
+
+
+def replica_configs(primary, environ):
+    """
+    Read only copies of the ``primary`` entry for the comma separated
+    ``DATABASE_REPLICAS``: file names for SQLite, host names otherwise. Tests
+    run them as mirrors of the primary.
+    """
+    key = "NAME" if "PRAGMAS" in primary or "sqlite" in primary["ENGINE"] else "HOST"
+    locations = [
+        location.strip()
+        for location in environ.get("DATABASE_REPLICAS", "").split(",")
+        if location.strip()
+    ]
+    return {
+        "replica%s"
+        % index: dict(primary, **{key: location}, TEST={"MIRROR": "default"})
+        for index, location in enumerate(locations, 1)
+    }
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get("PRAGMAS")
+    if connection.vendor != "sqlite" or not pragmas:
+        return
+    # On the DB-API connection: setup isn't one of the queries of whatever
+    # opened the connection, neither for the metrics nor for query counts
+    for name, value in pragmas.items():
+        connection.connection.execute("PRAGMA %s = %s" % (name, value))
+
+
+@receiver(request_started)
+def check_connections(sender, **kwargs):
+    # Django 3.2 only drops persistent connections once they errored, a
+    # connection the server closed in between would fail the next query.
+    from django.db import connections
+
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get("CONN_HEALTH_CHECKS")
+            and not connection.is_usable()
+        ):
+            connection.close()
@@ -0,0 +1,137 @@
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils.decorators import sync_and_async_middleware
+
+# Reads go to the replicas in turn unless the current request is pinned to
+# the primary: it writes, or the client wrote recently enough that a replica
+# may not have caught up yet (read-your-writes).
+
+_pinned = contextvars.ContextVar("pinned", default=False)
+
+
+@contextlib.contextmanager
+def use_primary(pinned=True):
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def reads_from_replicas():
+    return bool(settings.DATABASE_REPLICAS) and not _pinned.get()
+
+
+class ReplicaHealth:
+    """
+    Replicas failing a ``SELECT 1`` are ejected for ``REPLICA_RETRY_SECONDS``,
+    healthy ones are checked again every ``REPLICA_CHECK_SECONDS``.
+    """
+
+    def __init__(self):
+        self.checked = {}
+        self.ejected = {}
+        self.lock = threading.Lock()
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except DatabaseError:
+            connections[alias].close()
+            return False
+        return True
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self.lock:
+            if self.ejected.get(alias, 0) > now:
+                return False
+            if self.checked.get(alias, 0) > now:
+                return True
+            # Only one thread checks, the others keep the previous verdict
+            self.checked[alias] = now + settings.REPLICA_CHECK_SECONDS
+        healthy = self.check(alias)
+        if not healthy:
+            with self.lock:
+                self.ejected[alias] = now + settings.REPLICA_RETRY_SECONDS
+        return healthy
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.counter = itertools.count()
+        self.health = ReplicaHealth()
+
+    def db_for_read(self, model, **hints):
+        # A transaction on the primary must see its own writes
+        if not reads_from_replicas() or connections["default"].in_atomic_block:
+            return "default"
+        replicas = settings.DATABASE_REPLICAS
+        start = next(self.counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.health.is_healthy(alias):
+                return alias
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db == "default"
+
+
+def _writes(request):
+    return request.method not in ("GET", "HEAD", "OPTIONS")
+
+
+def _pins_primary(request):
+    return _writes(request) or settings.REPLICA_STICKY_COOKIE in request.COOKIES
+
+
+def _stick(request, response):
+    if _writes(request) and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE,
+            "1",
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    """
+    Pins requests that write to the primary and marks their client with a
+    cookie pinning its requests for the next ``REPLICA_STICKY_SECONDS``.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with use_primary(_pins_primary(request)):
+                response = await get_response(request)
+            return _stick(request, response)
+
+    else:
+
+        def middleware(request):
+            with use_primary(_pins_primary(request)):
+                response = get_response(request)
+            return _stick(request, response)
+
+    return middleware
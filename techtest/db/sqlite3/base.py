@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite takes the write lock on the first write of a transaction, and one
+    that has read before another writer committed can't take it anymore: it
+    fails with "database is locked" whatever the busy timeout. Taking the lock
+    when the transaction begins makes concurrent writers wait their turn.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
@@ -1,3 +1,5 @@
+import string
+
 import factory
 
 
@@ -13,7 +15,10 @@ class RegionFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = "regions.Region"
 
-    code = factory.LazyAttribute(lambda o: "%s" % o.name[:2].upper())
+    # Codes are unique, deriving them from the country name collides
+    code = factory.Sequence(
+        lambda n: string.ascii_uppercase[n // 26 % 26] + string.ascii_uppercase[n % 26]
+    )
     name = factory.Faker("country")
 
 
@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import contextvars
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.decorators import sync_and_async_middleware
+
+from techtest.authors.models import Author
+from techtest.regions.models import Region
+
+# Loaders batch and memoize lookups by key for the duration of a request:
+# keys are queued with ``prime`` and the first ``load`` fetches every queued
+# key with a single IN query.
+
+_loaders = contextvars.ContextVar("loaders", default=None)
+
+
+class Loader:
+    def __init__(self, model, field="pk"):
+        self.model = model
+        self.field = field
+        self.cache = {}
+        self.queue = set()
+
+    def prime(self, keys):
+        self.queue.update(key for key in keys if key is not None)
+        self.queue.difference_update(self.cache)
+
+    def remember(self, objs):
+        """Adds instances loaded by other means."""
+        self.cache.update((getattr(obj, self.field), obj) for obj in objs)
+        self.queue.difference_update(self.cache)
+
+    def dispatch(self):
+        if not self.queue:
+            return
+        queue, self.queue = self.queue, set()
+        objs = self.model.objects.filter(**{"%s__in" % self.field: queue})
+        self.cache.update(dict.fromkeys(queue))
+        self.cache.update((getattr(obj, self.field), obj) for obj in objs)
+
+    def load(self, key):
+        """The instance for ``key``, None if there's none."""
+        return self.load_many([key]).get(key)
+
+    def load_many(self, keys):
+        """The instances found for ``keys``, by key."""
+        keys = [key for key in keys if key is not None]
+        self.prime(keys)
+        self.dispatch()
+        return {key: self.cache[key] for key in keys if self.cache[key] is not None}
+
+    def forget(self, obj=None):
+        if obj is None:
+            self.cache.clear()
+            return
+        # Under its current key and any key it had before being changed
+        self.cache = {
+            key: cached
+            for key, cached in self.cache.items()
+            if cached is None or cached.pk != obj.pk
+        }
+        self.cache.pop(getattr(obj, self.field), None)
+
+
+def get_loader(model, field="pk"):
+    """
+    The loader of the current request scope, or a new one outside of any so
+    nothing is memoized across requests.
+    """
+    loaders = _loaders.get()
+    if loaders is None:
+        return Loader(model, field)
+    if (model, field) not in loaders:
+        loaders[model, field] = Loader(model, field)
+    return loaders[model, field]
+
+
+def forget(model, obj=None):
+    """Drops ``obj``, or every instance of ``model``, from the scope's loaders."""
+    for (loader_model, _), loader in (_loaders.get() or {}).items():
+        if loader_model is model:
+            loader.forget(obj)
+
+
+@contextlib.contextmanager
+def request_scope():
+    token = _loaders.set({})
+    try:
+        yield
+    finally:
+        _loaders.reset(token)
+
+
+@sync_and_async_middleware
+def loader_middleware(get_response):
+    # Async under ASGI so the stack in front of async views stays async, the
+    # scope is copied into the threads sync code runs in
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with request_scope():
+                return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            with request_scope():
+                return get_response(request)
+
+    return middleware
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+def forget_instance(sender, instance, **kwargs):
+    forget(sender, instance)
@@ -0,0 +1,222 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404
+from django.http.response import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+# Opt-in request profiling (METRICS_ENABLED): every request records its wall
+# time, the time and number of its SQL queries, how many of those repeated an
+# earlier one exactly, the time spent serializing and the response size.
+# Aggregates per URL name are served at /metrics/ in Prometheus text format.
+
+_profile = contextvars.ContextVar("profile", default=None)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS = {
+    "request_duration_seconds": "Wall time of requests.",
+    "sql_duration_seconds": "Time spent running SQL queries per request.",
+    "sql_queries": "SQL queries per request.",
+    "sql_duplicate_queries": "SQL queries repeating an earlier one per request.",
+    "serialization_duration_seconds": "Time spent dumping and encoding per request.",
+    "response_size_bytes": "Size of the response body.",
+}
+
+
+class Profile:
+    def __init__(self):
+        self.sql_duration = 0.0
+        self.queries = collections.Counter()
+        self.serialization_duration = 0.0
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_duration += time.perf_counter() - start
+            self.queries[sql, repr(params)] += 1
+
+
+@contextlib.contextmanager
+def serialization():
+    """Times the block as serialization, nested blocks count once."""
+    profile = _profile.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialization_duration += time.perf_counter() - start
+        profile.serializing = False
+
+
+class Summary:
+    """Count, sum and quantiles over the last ``METRICS_SAMPLES`` values."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = collections.deque(maxlen=settings.METRICS_SAMPLES)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantiles(self):
+        samples = sorted(self.samples)
+        return [
+            (quantile, samples[min(int(quantile * len(samples)), len(samples) - 1)])
+            for quantile in QUANTILES
+        ]
+
+
+class Registry:
+    def __init__(self):
+        self.summaries = collections.defaultdict(Summary)
+        self.lock = threading.Lock()
+
+    def record(self, view, values):
+        with self.lock:
+            for name, value in values.items():
+                self.summaries[name, view].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.summaries.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, help_text in METRICS.items():
+                metric = "techtest_%s" % name
+                lines += [
+                    "# HELP %s %s" % (metric, help_text),
+                    "# TYPE %s summary" % metric,
+                ]
+                for (summary_name, view), summary in sorted(self.summaries.items()):
+                    if summary_name != name:
+                        continue
+                    for quantile, value in summary.quantiles():
+                        lines.append(
+                            '%s{view="%s",quantile="%s"} %r'
+                            % (metric, view, quantile, value)
+                        )
+                    lines.append('%s_sum{view="%s"} %r' % (metric, view, summary.sum))
+                    lines.append(
+                        '%s_count{view="%s"} %d' % (metric, view, summary.count)
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def _execute(execute, sql, params, many, context):
+    # Queries count towards the profile of the request running them, in
+    # whatever thread, concurrent async requests included
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute)
+
+
+@receiver(connection_created)
+def install_wrapper(sender, connection, **kwargs):
+    # Connections belong to the thread that opened them, sync_to_async
+    # workers included, so every one gets the wrapper when it connects
+    if settings.METRICS_ENABLED:
+        _install(connection)
+
+
+@receiver(setting_changed)
+def metrics_enabled(setting, value, **kwargs):
+    # Tests turn metrics on once this thread's connections are open
+    if setting == "METRICS_ENABLED" and value:
+        for connection in connections.all():
+            _install(connection)
+
+
+@contextlib.contextmanager
+def _profiling():
+    profile = Profile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+def _record(request, response, profile, duration):
+    match = request.resolver_match
+    view = match.url_name if match and match.url_name else "unmatched"
+    if view != "metrics":
+        queries = sum(profile.queries.values())
+        registry.record(
+            view,
+            {
+                "request_duration_seconds": duration,
+                "sql_duration_seconds": profile.sql_duration,
+                "sql_queries": queries,
+                "sql_duplicate_queries": queries - len(profile.queries),
+                "serialization_duration_seconds": profile.serialization_duration,
+                # Streamed bodies are only produced after this returns
+                "response_size_bytes": (
+                    0 if response.streaming else len(response.content)
+                ),
+            },
+        )
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    if not settings.METRICS_ENABLED:
+        raise MiddlewareNotUsed()
+
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            start = time.perf_counter()
+            with _profiling() as profile:
+                response = await get_response(request)
+            return _record(request, response, profile, time.perf_counter() - start)
+
+    else:
+
+        def middleware(request):
+            start = time.perf_counter()
+            with _profiling() as profile:
+                response = get_response(request)
+            return _record(request, response, profile, time.perf_counter() - start)
+
+    return middleware
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
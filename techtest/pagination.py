@@ -0,0 +1,122 @@
+import base64
+import json
+
+from django.conf import settings
+
+from techtest.schemas import dump
+from techtest.utils import json_response
+
+
+class InvalidPage(Exception):
+    pass
+
+
+def encode_cursor(direction, pk):
+    data = json.dumps([direction, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, pk = json.loads(data)
+    except (ValueError, TypeError):
+        raise InvalidPage("Invalid cursor")
+    if direction not in ("next", "prev") or not isinstance(pk, int):
+        raise InvalidPage("Invalid cursor")
+    return direction, pk
+
+
+def get_page_size(request):
+    page_size = request.GET.get("page_size")
+    if page_size is None:
+        return settings.PAGINATION_PAGE_SIZE
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise InvalidPage("Invalid page size")
+    if page_size < 1:
+        raise InvalidPage("Invalid page size")
+    return min(page_size, settings.PAGINATION_MAX_PAGE_SIZE)
+
+
+class CursorPage:
+    def __init__(self, objects, next_cursor=None, prev_cursor=None):
+        self.objects = objects
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def links(self, request):
+        links = []
+        for rel, cursor in (("next", self.next_cursor), ("prev", self.prev_cursor)):
+            if cursor:
+                params = request.GET.copy()
+                params["cursor"] = cursor
+                url = request.build_absolute_uri(
+                    "%s?%s" % (request.path, params.urlencode())
+                )
+                links.append('<%s>; rel="%s"' % (url, rel))
+        return {"Link": ", ".join(links)} if links else {}
+
+
+def paginate(request, queryset):
+    """
+    Keyset pagination on the primary key: each page is a range scan starting
+    right after (or before) the pk carried by the cursor, so deep pages cost
+    the same as the first one.
+    """
+    page_size = get_page_size(request)
+    cursor = request.GET.get("cursor")
+    direction, pk = decode_cursor(cursor) if cursor else ("next", None)
+
+    if direction == "next":
+        if pk is not None:
+            queryset = queryset.filter(pk__gt=pk)
+        objects = list(queryset.order_by("pk")[: page_size + 1])
+        has_more, objects = len(objects) > page_size, objects[:page_size]
+        if not objects:
+            return CursorPage(objects)
+        return CursorPage(
+            objects,
+            next_cursor=has_more and encode_cursor("next", objects[-1].pk),
+            prev_cursor=pk is not None and encode_cursor("prev", objects[0].pk),
+        )
+
+    objects = list(queryset.filter(pk__lt=pk).order_by("-pk")[: page_size + 1])
+    has_more, objects = len(objects) > page_size, objects[:page_size][::-1]
+    if not objects:
+        return CursorPage(objects)
+    return CursorPage(
+        objects,
+        next_cursor=encode_cursor("next", objects[-1].pk),
+        prev_cursor=has_more and encode_cursor("prev", objects[0].pk),
+    )
+
+
+def paginate_offset(request, fetch):
+    """
+    Pagination for rows without a key to seek on, like ranked search results:
+    the cursor carries the offset and ``fetch(offset, limit)`` returns rows.
+    """
+    page_size = get_page_size(request)
+    cursor = request.GET.get("cursor")
+    offset = decode_cursor(cursor)[1] if cursor else 0
+    if offset < 0:
+        raise InvalidPage("Invalid cursor")
+    objects = fetch(offset, page_size + 1)
+    has_more, objects = len(objects) > page_size, objects[:page_size]
+    return CursorPage(
+        objects,
+        next_cursor=has_more and encode_cursor("next", offset + page_size),
+        prev_cursor=offset > 0 and encode_cursor("prev", max(offset - page_size, 0)),
+    )
+
+
+def paginated_response(request, queryset, schema):
+    try:
+        page = paginate(request, queryset)
+    except InvalidPage as e:
+        return json_response({"error": str(e)}, 400)
+    return json_response(
+        dump(schema, page.objects, many=True), headers=page.links(request)
+    )
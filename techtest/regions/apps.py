@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RegionsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "techtest.regions"
+
+    def ready(self):
+        # Connects the signal handlers
+        import techtest.regions.cache  # noqa: F401
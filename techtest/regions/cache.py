@@ -0,0 +1,105 @@
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from techtest.loaders import forget, get_loader
+from techtest.regions.models import Region
+
+
+class RegionCache:
+    """
+    Process wide id -> Region and code -> Region maps. Regions hardly ever
+    change, so they are loaded once and dropped whenever one is written;
+    lookups that miss go through the request's loaders. The cached instances
+    are shared, treat them as read only.
+    """
+
+    def __init__(self):
+        self.regions = None
+        # Set on a thread whose open transaction wrote regions: what it reads
+        # may still be rolled back, so it must not fill the cache.
+        self.local = threading.local()
+
+    def warm(self):
+        regions = list(Region.objects.all())
+        self.regions = (
+            {region.pk: region for region in regions},
+            {region.code: region for region in regions},
+        )
+        self.local.dirty = False
+        return self.regions
+
+    def clear(self):
+        self.regions = None
+
+    def changed(self):
+        self.clear()
+        forget(Region)
+        if connection.in_atomic_block:
+            self.local.dirty = True
+            transaction.on_commit(self.committed)
+
+    def committed(self):
+        self.local.dirty = False
+        self.clear()
+
+    def get_maps(self):
+        regions = self.regions
+        if regions is not None or not settings.REGION_CACHE:
+            return regions
+        if getattr(self.local, "dirty", False):
+            if connection.in_atomic_block:
+                return None
+            # The transaction that wrote was rolled back
+            self.local.dirty = False
+        return self.warm()
+
+    def prime(self, ids=(), codes=()):
+        """Queues the ids and codes missing from the cache on the loaders."""
+        by_id, by_code = self.get_maps() or ({}, {})
+        get_loader(Region).prime(pk for pk in ids if pk not in by_id)
+        get_loader(Region, "code").prime(code for code in codes if code not in by_code)
+
+    def get_many(self, ids=(), codes=()):
+        """The regions with the given ids and codes, by id and by code."""
+        by_id, by_code = self.get_maps() or ({}, {})
+        found = [by_id[pk] for pk in ids if pk in by_id]
+        found += [by_code[code] for code in codes if code in by_code]
+        # Misses go through the request's loaders, batched and memoized
+        missing_ids = [pk for pk in ids if pk not in by_id]
+        found += get_loader(Region).load_many(missing_ids).values()
+        missing_codes = [code for code in codes if code not in by_code]
+        found += get_loader(Region, "code").load_many(missing_codes).values()
+        return (
+            {region.pk: region for region in found},
+            {region.code: region for region in found},
+        )
+
+    def get(self, pk=None, code=None):
+        by_id, by_code = self.get_many(
+            ids=[pk] if pk is not None else [], codes=[code] if code else []
+        )
+        return by_id.get(pk) if pk is not None else by_code.get(code)
+
+
+region_cache = RegionCache()
+
+
+def warm_up():
+    """Loads the region cache ahead of the first request."""
+    if not settings.REGION_CACHE:
+        return
+    try:
+        region_cache.warm()
+    except DatabaseError:
+        # Not migrated yet, the first lookup loads it
+        pass
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+def clear_region_cache(sender, **kwargs):
+    region_cache.changed()
@@ -4,3 +4,4 @@ from django.db import models
 class Region(models.Model):
     code = models.CharField(max_length=2, unique=True)
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
@@ -2,6 +2,7 @@ from marshmallow import Schema, ValidationError, fields, validate
 from marshmallow.decorators import post_load
 
 from techtest.regions.models import Region
+from techtest.schemas import update_instance
 
 
 class RegionSchema(Schema):
@@ -14,6 +15,12 @@ class RegionSchema(Schema):
 
     @post_load
     def update_or_create(self, data, *args, **kwargs):
+        instance = self.context.get("instance")
+        if instance is not None and data.get("id") == instance.pk:
+            data.pop("id")
+            update_instance(instance, data)
+            return instance
+
         region_id = data.pop("id", None)
         if not region_id:
             if Region.objects.filter(code=data.get("code")).exists():
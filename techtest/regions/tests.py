@@ -1,8 +1,12 @@
 import json
 
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from techtest.authors.models import Author
+from techtest.regions.cache import region_cache
 from techtest.regions.models import Region
 
 
@@ -115,7 +119,105 @@ class RegionViewTestCase(TestCase):
             response.json(),
         )
 
+    def test_update_writes_only_changed_fields(self):
+        payload = {"code": "AL", "name": "Albanie"}
+        with CaptureQueriesContext(connection) as context:
+            self.client.put(
+                self.url, data=json.dumps(payload), content_type="application/json"
+            )
+        # The region, then one UPDATE of the changed field
+        self.assertEqual(len(context.captured_queries), 2)
+        update = context.captured_queries[1]["sql"]
+        self.assertIn('"name"', update)
+        self.assertNotIn('"code"', update)
+        # Nothing left to write
+        with self.assertNumQueries(1):
+            self.client.put(
+                self.url, data=json.dumps(payload), content_type="application/json"
+            )
+
+    def test_patches_only_sent_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                self.url,
+                data=json.dumps({"name": "Albanie"}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(
+            response.json(), {"id": self.region.id, "code": "AL", "name": "Albanie"}
+        )
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertNotIn('"code"', context.captured_queries[1]["sql"])
+        response = self.client.patch(
+            self.url, data=json.dumps({"code": "ALB"}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_removes_region(self):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Region.objects.count(), 0)
+
+
+@override_settings(REGION_CACHE=True)
+class RegionCacheTestCase(TestCase):
+    def setUp(self):
+        self.region = Region.objects.create(code="AL", name="Albania")
+        self.url = reverse("region-code", kwargs={"region_code": "AL"})
+        # Regions created by the test only count as committed once warmed
+        region_cache.warm()
+        self.addCleanup(region_cache.clear)
+
+    def test_lookup_by_code_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {"id": self.region.id, "code": "AL", "name": "Albania"}
+        )
+        response = self.client.get(reverse("region-code", kwargs={"region_code": "ZZ"}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.delete(self.url).status_code, 405)
+
+    def test_refreshed_on_region_writes(self):
+        self.client.put(
+            reverse("region", kwargs={"region_id": self.region.id}),
+            data=json.dumps({"code": "AL", "name": "Albanie"}),
+            content_type="application/json",
+        )
+        self.assertEqual(self.client.get(self.url).json()["name"], "Albanie")
+        self.region.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_rolled_back_regions_are_not_cached(self):
+        with transaction.atomic():
+            Region.objects.create(code="ZZ", name="Phantom")
+            self.assertEqual(region_cache.get(code="ZZ").name, "Phantom")
+            transaction.set_rollback(True)
+        self.assertIsNone(region_cache.get(code="ZZ"))
+        self.assertIsNone(region_cache.regions)
+
+    def test_article_writes_do_not_query_regions(self):
+        author = Author.objects.create(first_name="A", last_name="B")
+        payload = {
+            "title": "Title",
+            "author_id": author.id,
+            "regions": [{"id": self.region.id}, {"code": "AL"}],
+        }
+        for url in [reverse("articles-list"), reverse("articles-bulk")]:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    url,
+                    data=json.dumps([payload] if "bulk" in url else payload),
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertFalse(
+                [
+                    query["sql"]
+                    for query in context.captured_queries
+                    # Region lookups, not the article's links
+                    if 'FROM "regions_region" WHERE' in query["sql"]
+                ]
+            )
@@ -1,48 +1,111 @@
-import json
-
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from marshmallow import ValidationError
 
+from techtest import codec
+from techtest.cache import cache_response
+from techtest.pagination import paginated_response
+from techtest.regions.cache import region_cache
 from techtest.regions.models import Region
 from techtest.regions.schemas import RegionSchema
-from techtest.utils import json_response
+from techtest.schemas import dump, get_request_schema, get_schema
+from techtest.utils import (
+    AsyncViewMixin,
+    conditional,
+    json_response,
+    make_etag,
+    optimize_queryset,
+    stream_json_response,
+    table_validators,
+)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("regions"), name="dispatch")
 class RegionsListView(View):
+    def get_validators(self, request):
+        return table_validators(request, Region)
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(RegionSchema().dump(Region.objects.all(), many=True))
+        try:
+            schema = get_request_schema(request, RegionSchema)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        regions = optimize_queryset(Region.objects.all(), schema)
+        if "stream" in request.GET:
+            return stream_json_response(regions, schema)
+        return paginated_response(request, regions, schema)
 
     def post(self, request, *args, **kwargs):
         try:
-            region = RegionSchema().load(json.loads(request.body))
+            region = RegionSchema().load(codec.loads(request.body))
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(RegionSchema().dump(region), 201)
+        return json_response(dump(get_schema(RegionSchema), region), 201)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(cache_response("region:{region_id}"), name="dispatch")
 class RegionView(View):
     def dispatch(self, request, region_id, *args, **kwargs):
         try:
             self.region = Region.objects.get(pk=region_id)
         except Region.DoesNotExist:
             return json_response({"error": "No Region matches the given query"}, 404)
-        self.data = request.body and dict(json.loads(request.body), id=self.region.id)
+        self.data = request.body and dict(codec.loads(request.body), id=self.region.id)
         return super(RegionView, self).dispatch(request, *args, **kwargs)
 
+    def get_validators(self, request):
+        return make_etag(self.region.pk, self.region.updated_at), self.region.updated_at
+
+    @conditional
     def get(self, request, *args, **kwargs):
-        return json_response(RegionSchema().dump(self.region))
+        try:
+            schema = get_request_schema(request, RegionSchema)
+        except ValidationError as e:
+            return json_response(e.messages, 400)
+        return json_response(dump(schema, self.region))
 
+    @conditional
     def put(self, request, *args, **kwargs):
+        return self.update(partial=False)
+
+    @conditional
+    def patch(self, request, *args, **kwargs):
+        return self.update(partial=True)
+
+    def update(self, partial):
+        schema = RegionSchema(context={"instance": self.region}, partial=partial)
         try:
-            self.region = RegionSchema().load(self.data)
+            self.region = schema.load(self.data)
         except ValidationError as e:
             return json_response(e.messages, 400)
-        return json_response(RegionSchema().dump(self.region))
+        return json_response(dump(get_schema(RegionSchema), self.region))
 
+    @conditional
     def delete(self, request, *args, **kwargs):
         self.region.delete()
         return json_response()
+
+
+class RegionCodeView(RegionView):
+    # Read only lookup by code, answered from the region cache
+    http_method_names = ["get", "head", "options"]
+
+    def dispatch(self, request, region_code, *args, **kwargs):
+        self.region = region_cache.get(code=region_code)
+        if self.region is None:
+            return json_response({"error": "No Region matches the given query"}, 404)
+        return View.dispatch(self, request, *args, **kwargs)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegionsListView(AsyncViewMixin, RegionsListView):
+    pass
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegionView(AsyncViewMixin, RegionView):
+    pass
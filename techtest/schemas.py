@@ -0,0 +1,214 @@
+import functools
+
+from django.conf import settings
+from marshmallow import ValidationError, fields
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+from techtest import metrics
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema(schema_class, only=None):
+    """
+    Returns a process wide instance of ``schema_class`` to dump with. Dumping
+    is stateless so instances are shared, schemas used to ``load`` carry
+    per-request state and must still be created per request.
+    """
+    return schema_class(only=only)
+
+
+def get_request_schema(request, schema_class):
+    """
+    The shared dump schema for ``schema_class`` narrowed to the sparse
+    fieldset asked for in the query string: ``?fields=id,title`` selects top
+    level fields and ``?fields[author]=id`` the fields of a nested schema.
+    """
+    selected = {}
+    for key, values in request.GET.lists():
+        if key == "fields":
+            name = None
+        elif key.startswith("fields[") and key.endswith("]"):
+            name = key[len("fields[") : -1]
+        else:
+            continue
+        selected[name] = {
+            field.strip()
+            for value in values
+            for field in value.split(",")
+            if field.strip()
+        }
+        if not selected[name]:
+            raise ValidationError({key: ["Select at least one field."]})
+    if not selected:
+        return get_schema(schema_class)
+
+    available = get_schema(schema_class).dump_fields
+    top = selected.pop(None, set(available))
+    only = set()
+    for name in sorted(top):
+        if name not in available:
+            raise ValidationError({"fields": ["Unknown field %r." % name]})
+        if name not in selected:
+            only.add(name)
+    for name, nested in selected.items():
+        key = "fields[%s]" % name
+        field = available.get(name)
+        if not isinstance(field, fields.Nested):
+            raise ValidationError({key: ["%r is not a nested field." % name]})
+        if name not in top:
+            raise ValidationError({key: ["%r is not in the selected fields." % name]})
+        for nested_name in sorted(nested):
+            if nested_name not in field.schema.dump_fields:
+                raise ValidationError({key: ["Unknown field %r." % nested_name]})
+            only.add("%s.%s" % (name, nested_name))
+    return get_schema(schema_class, only=tuple(sorted(only)))
+
+
+def update_instance(instance, data, touch=False):
+    """
+    Sets ``data`` on an already loaded ``instance`` and saves the fields that
+    changed, plus its ``auto_now`` fields, in a single UPDATE. Nothing is
+    written when nothing changed unless ``touch``.
+    """
+    changed = []
+    for name, value in data.items():
+        field = instance._meta.get_field(name)
+        if field.is_relation:
+            current, new = getattr(instance, field.attname), getattr(value, "pk", None)
+        else:
+            current, new = getattr(instance, name), value
+        if current != new:
+            setattr(instance, name, value)
+            changed.append(name)
+    if changed or touch:
+        auto_now = [
+            field.name
+            for field in instance._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+        instance.save(update_fields=changed + auto_now)
+    return changed
+
+
+def dump(schema, obj, many=False):
+    """
+    Same output as ``schema.dump(obj, many=many)`` for model instances,
+    through a serializer function generated once per schema instance instead
+    of dispatching through every field for every object.
+    """
+    try:
+        dumper = schema._dumper
+    except AttributeError:
+        dumper = schema._dumper = compile_dumper(schema)
+    with metrics.serialization():
+        if many:
+            return [dumper(item) for item in obj]
+        return dumper(obj)
+
+
+def _integer(value):
+    return None if value is None else int(value)
+
+
+def _string(value):
+    return None if value is None else str(value)
+
+
+def _nested(field):
+    schema = field.schema
+
+    def serialize(value):
+        return None if value is None else dump(schema, value)
+
+    return serialize
+
+
+def _generic(name, field, schema):
+    def serialize(obj):
+        return field.serialize(name, obj, accessor=schema.get_attribute)
+
+    return serialize
+
+
+def _from_attribute(attribute, serialize):
+    def get(obj):
+        return serialize(getattr(obj, attribute))
+
+    return get
+
+
+def _snapshot(column, field, fallback):
+    # With SNAPSHOTS on, the field is read from the already dumped value in
+    # ``column``, narrowed to the nested fields selected
+    nested = field.schema if isinstance(field, fields.Nested) else None
+    keys = None
+    if nested is not None:
+        keys = [f.data_key or name for name, f in nested.dump_fields.items()]
+
+    def select(value):
+        return {key: value[key] for key in keys if key in value}
+
+    def serialize(obj):
+        value = getattr(obj, column) if settings.SNAPSHOTS else None
+        if value is None:
+            # Not built yet, or a null relation
+            return fallback(obj)
+        if keys is None:
+            return value
+        return [select(item) for item in value] if field.many else select(value)
+
+    return serialize
+
+
+def compile_dumper(schema):
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return functools.partial(schema.dump, many=False)
+
+    namespace = {}
+    items = []
+    snapshots = getattr(schema.Meta, "snapshots", {})
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else name
+        attribute = field.attribute or name
+        helper = "_f%s" % index
+        plain = attribute.isidentifier() and field.dump_default is fields.missing_
+        if name in snapshots:
+            if plain and type(field) is fields.Nested and not field.many:
+                fallback = _from_attribute(attribute, _nested(field))
+            elif type(field) is fields.Method and field.serialize_method_name:
+                fallback = getattr(schema, field.serialize_method_name)
+            else:
+                fallback = _generic(name, field, schema)
+            namespace[helper] = _snapshot(snapshots[name], field, fallback)
+            items.append("%r: %s(obj)" % (key, helper))
+            continue
+        if plain and type(field) is fields.Integer and not field.as_string:
+            namespace[helper] = _integer
+        elif plain and type(field) is fields.String:
+            namespace[helper] = _string
+        elif plain and type(field) is fields.Nested and not field.many:
+            namespace[helper] = _nested(field)
+        elif type(field) is fields.Method and field.serialize_method_name:
+            namespace[helper] = getattr(schema, field.serialize_method_name)
+            items.append("%r: %s(obj)" % (key, helper))
+            continue
+        else:
+            # Anything else keeps marshmallow's semantics, including skipping
+            # values it reports as missing.
+            namespace[helper] = _generic(name, field, schema)
+            items.append((key, helper))
+            continue
+        items.append("%r: %s(obj.%s)" % (key, helper, attribute))
+
+    plain_items = ", ".join(item for item in items if isinstance(item, str))
+    source = ["def dump(obj):", "    data = {%s}" % plain_items]
+    for key, helper in (item for item in items if not isinstance(item, str)):
+        source += [
+            "    value = %s(obj)" % helper,
+            "    if value is not missing:",
+            "        data[%r] = value" % key,
+        ]
+    source.append("    return data")
+    namespace["missing"] = fields.missing_
+    exec("\n".join(source), namespace)
+    return namespace["dump"]
@@ -0,0 +1,137 @@
+import functools
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from techtest.articles.models import Article
+
+# Search over article titles and contents goes through a backend that keeps
+# its own index in sync from the article signals (and from the bulk paths,
+# which send none) and returns article ids, best match first.
+
+
+def get_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+class FTS5Backend:
+    """An SQLite FTS5 table keyed by article id, created by a migration."""
+
+    table = "articles_article_search"
+
+    def index(self, articles):
+        articles = list(articles)
+        if not articles:
+            return
+        self.remove(article.pk for article in articles)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO %s (rowid, title, content) VALUES (%%s, %%s, %%s)"
+                % self.table,
+                [(article.pk, article.title, article.content) for article in articles],
+            )
+
+    def remove(self, article_ids):
+        article_ids = list(article_ids)
+        if not article_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM %s WHERE rowid IN (%s)"
+                % (self.table, ", ".join(["%s"] * len(article_ids))),
+                article_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % self.table)
+            cursor.execute(
+                "INSERT INTO %s (rowid, title, content) "
+                "SELECT id, title, content FROM articles_article" % self.table
+            )
+
+    def search(self, query, offset, limit):
+        # Every term is quoted so user input can't be read as FTS5 syntax, a
+        # title hit weighs ten times a content hit.
+        match = " ".join('"%s"' % term for term in get_terms(query))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid FROM {table} WHERE {table} MATCH %s "
+                "ORDER BY bm25({table}, 10.0, 1.0), rowid "
+                "LIMIT %s OFFSET %s".format(table=self.table),
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class LikeBackend:
+    """
+    Works on any database without an index to maintain: every term has to be
+    in the title or content, articles with all of them in the title first.
+    """
+
+    def index(self, articles):
+        pass
+
+    def remove(self, article_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, offset, limit):
+        articles = Article.objects.all()
+        in_title = Q()
+        for term in get_terms(query):
+            articles = articles.filter(
+                Q(title__icontains=term) | Q(content__icontains=term)
+            )
+            in_title &= Q(title__icontains=term)
+        articles = articles.annotate(
+            title_rank=Case(
+                When(in_title, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by("title_rank", "pk")
+        return list(articles.values_list("pk", flat=True)[offset : offset + limit])
+
+
+BACKENDS = {"fts5": FTS5Backend, "like": LikeBackend}
+
+
+@functools.lru_cache(maxsize=None)
+def load_backend(name, vendor):
+    if name == "auto":
+        return load_backend("fts5" if vendor == "sqlite" else "like", vendor)
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured("Unknown SEARCH_BACKEND %r" % name)
+
+
+def get_backend():
+    return load_backend(settings.SEARCH_BACKEND, connection.vendor)
+
+
+def search_articles(queryset, query, offset, limit):
+    """The page of ``queryset`` matching ``query``, in rank order."""
+    article_ids = get_backend().search(query, offset, limit)
+    articles = queryset.in_bulk(article_ids)
+    return [articles[pk] for pk in article_ids if pk in articles]
+
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"title", "content"} & set(update_fields):
+        get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Article)
+def remove_article(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
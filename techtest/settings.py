@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from techtest.db import database_config, replica_configs
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,12 +47,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "techtest.metrics.metrics_middleware",
+    "techtest.db.router.replica_middleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "techtest.loaders.loader_middleware",
 ]
 
 ROOT_URLCONF = "techtest.urls"
@@ -72,17 +78,60 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "techtest.wsgi.application"
 
+TEST_RUNNER = "techtest.testing.TestRunner"
+
+# URL names served by the async variant of their view, e.g. "articles-list"
+
+ASYNC_VIEWS = []
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
+# Configured from DATABASE_* environment variables, see
+# techtest.db.database_config (importing it also connects the connection hooks)
+
+DATABASES = {"default": database_config(os.environ, BASE_DIR / "db.sqlite3")}
+
+DATABASES.update(replica_configs(DATABASES["default"], os.environ))
+
+# GET requests read from the replicas in turn (techtest.db.router), requests
+# that write and the next ones from the same client for REPLICA_STICKY_SECONDS
+# use the primary. A replica failing a health check (every
+# REPLICA_CHECK_SECONDS) is left out for REPLICA_RETRY_SECONDS.
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
+DATABASE_ROUTERS = ["techtest.db.router.ReplicaRouter"]
+
+REPLICA_STICKY_COOKIE = "use_primary"
+
+REPLICA_STICKY_SECONDS = 5
+
+REPLICA_CHECK_SECONDS = 5
+
+REPLICA_RETRY_SECONDS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
+# Cache alias serialized GET responses are stored in, None disables caching
+
+API_CACHE = "api"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -126,3 +175,55 @@ STATIC_URL = "/static/"
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# JSON backend used to encode responses and decode request bodies, one of
+# "orjson", "ujson" or "json". "auto" picks the fastest one installed.
+
+JSON_CODEC = "auto"
+
+# List endpoints use keyset pagination, clients may ask for up to
+# PAGINATION_MAX_PAGE_SIZE rows per page with ?page_size=
+
+PAGINATION_PAGE_SIZE = 100
+
+PAGINATION_MAX_PAGE_SIZE = 1000
+
+# Rows fetched per query when a list is streamed in full with ?stream=1
+
+STREAMING_CHUNK_SIZE = 500
+
+# Deleting an author deletes its articles this many at a time, one
+# transaction per batch
+
+DELETE_BATCH_SIZE = 2000
+
+# Article search backend: "fts5" (SQLite full text index), "like" (plain
+# LIKE queries, any database) or "auto" to use "fts5" on SQLite
+
+SEARCH_BACKEND = "auto"
+
+# Regions are kept in a process wide cache for lookups by id and code, it is
+# refreshed on every region write
+
+REGION_CACHE = True
+
+# Per-request profiling (wall, SQL and serialization time, query counts and
+# response size) aggregated by URL name and served at /metrics/ in Prometheus
+# text format. Quantiles are computed over the last METRICS_SAMPLES requests.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "") == "1"
+
+METRICS_SAMPLES = 1000
+
+# Articles keep their dumped author and regions in JSON columns, kept up to
+# date on every write, and lists render them from there without joining the
+# author and region tables. Run `manage.py refresh_snapshots` after turning
+# this on.
+
+SNAPSHOTS = False
+
+# Article detail responses are rendered when the article is written and
+# served from the stored bytes (techtest.articles.rendering). Run
+# `manage.py render_articles` after turning this on.
+
+MATERIALIZED_RESPONSES = False
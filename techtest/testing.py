@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Cached responses and regions would outlive the rollback at the end of
+        # each test, tests exercising them enable them with override_settings.
+        self.disable_caches = override_settings(API_CACHE=None, REGION_CACHE=False)
+        self.disable_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.disable_caches.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryCountMixin:
+    def count_queries(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, func, grow, steps=3):
+        """
+        Calls ``func`` after each call to ``grow`` and asserts the number of
+        queries it runs does not change as the dataset grows.
+        """
+        counts = []
+        for _ in range(steps):
+            grow()
+            counts.append(self.count_queries(func))
+        self.assertEqual(
+            len(set(counts)), 1, "Query count grows with dataset: %s" % counts
+        )
+        return counts[0]
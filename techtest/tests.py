@@ -0,0 +1,877 @@
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from marshmallow import Schema, fields, post_dump
+
+import techtest.factories as f
+from techtest import codec, metrics
+from techtest.articles.models import Article
+from techtest.articles.schemas import ArticleSchema
+from techtest.articles.views import (
+    ArticlesListView,
+    ArticleView,
+    AsyncArticlesListView,
+    AsyncArticleView,
+)
+from techtest.authors.models import Author
+from techtest.authors.schemas import AuthorSchema
+from techtest.cache import cache_response
+from techtest.db import check_connections, database_config
+from techtest.db.router import (
+    ReplicaHealth,
+    ReplicaRouter,
+    reads_from_replicas,
+    replica_middleware,
+    use_primary,
+)
+from techtest.loaders import get_loader, loader_middleware, request_scope
+from techtest.pagination import encode_cursor
+from techtest.regions.models import Region
+from techtest.regions.schemas import RegionSchema
+from techtest.schemas import dump, get_schema
+from techtest.testing import QueryCountMixin
+from techtest.urls import route
+from techtest.utils import iter_json_array, json_response, optimize_queryset
+
+
+def get_links(response):
+    return dict(
+        (rel, url)
+        for url, rel in re.findall(r'<([^>]+)>; rel="(\w+)"', response.get("Link", ""))
+    )
+
+
+@override_settings(PAGINATION_PAGE_SIZE=2, PAGINATION_MAX_PAGE_SIZE=3)
+class CursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse("authors-list")
+        self.authors = f.AuthorFactory.create_batch(size=5)
+        self.ids = [author.id for author in self.authors]
+
+    def get_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [author["id"] for author in response.json()]
+
+    def test_walks_pages_forward_and_backward(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.get_ids(response), self.ids[:2])
+        self.assertNotIn("prev", get_links(response))
+
+        response = self.client.get(get_links(response)["next"])
+        self.assertEqual(self.get_ids(response), self.ids[2:4])
+
+        last = self.client.get(get_links(response)["next"])
+        self.assertEqual(self.get_ids(last), self.ids[4:])
+        self.assertNotIn("next", get_links(last))
+
+        response = self.client.get(get_links(last)["prev"])
+        self.assertEqual(self.get_ids(response), self.ids[2:4])
+        response = self.client.get(get_links(response)["prev"])
+        self.assertEqual(self.get_ids(response), self.ids[:2])
+        self.assertNotIn("prev", get_links(response))
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(self.url, {"page_size": 100})
+        self.assertEqual(self.get_ids(response), self.ids[:3])
+
+    def test_rejects_invalid_page_size_and_cursor(self):
+        for params in ({"page_size": "a"}, {"page_size": 0}, {"cursor": "foo"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.json())
+
+    def test_pages_are_keyset_range_scans(self):
+        cursor = encode_cursor("next", self.ids[2])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"cursor": cursor})
+        self.assertEqual(self.get_ids(response), self.ids[3:])
+        sql = context.captured_queries[-1]["sql"]
+        self.assertIn('"id" > %s' % self.ids[2], sql)
+        self.assertNotIn("OFFSET", sql)
+
+    def test_all_list_endpoints_are_paginated(self):
+        f.ArticleFactory.create_batch(size=3)
+        for code in ("AL", "UK", "US"):
+            f.RegionFactory(code=code)
+        for name in ("articles-list", "regions-list"):
+            response = self.client.get(reverse(name))
+            self.assertEqual(len(response.json()), 2)
+            self.assertIn("next", get_links(response))
+
+
+class StreamingResponseTestCase(TestCase):
+    def seed(self, count):
+        author = Author.objects.create(first_name="Jane", last_name="Doe")
+        regions = [
+            Region.objects.get_or_create(code="AL", name="Albania")[0],
+            Region.objects.get_or_create(code="UK", name="United Kingdom")[0],
+        ]
+        start = Article.objects.count()
+        Article.objects.bulk_create(
+            Article(title="Article %s" % i, content="x" * 200, author=author)
+            for i in range(start, start + count)
+        )
+        Through = Article.regions.through
+        Through.objects.bulk_create(
+            Through(article_id=article_id, region=region)
+            for article_id in Article.objects.values_list("id", flat=True)[start:]
+            for region in regions
+        )
+
+    def measure_peak(self, func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def stream(self):
+        schema = ArticleSchema()
+        queryset = optimize_queryset(Article.objects.all(), schema)
+        for _ in iter_json_array(queryset, schema, chunk_size=100):
+            pass
+
+    def dump(self):
+        schema = ArticleSchema()
+        queryset = optimize_queryset(Article.objects.all(), schema)
+        json_response(schema.dump(queryset, many=True))
+
+    def test_streams_every_row_as_a_json_array(self):
+        self.seed(5)
+        for name in ("articles-list", "authors-list", "regions-list"):
+            response = self.client.get(reverse(name), {"stream": 1})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            data = json.loads(b"".join(response.streaming_content))
+            model = {"articles-list": Article, "authors-list": Author}.get(name, Region)
+            self.assertEqual(len(data), model.objects.count())
+
+    def test_streamed_articles_match_regular_serialization(self):
+        self.seed(250)
+        schema = ArticleSchema()
+        queryset = optimize_queryset(Article.objects.all(), schema)
+        data = json.loads(b"".join(iter_json_array(queryset, schema, chunk_size=100)))
+        self.assertEqual(data, schema.dump(queryset.order_by("pk"), many=True))
+
+    def test_peak_memory_does_not_grow_with_dataset(self):
+        self.seed(400)
+        small_stream = self.measure_peak(self.stream)
+        self.seed(1200)
+        large_stream = self.measure_peak(self.stream)
+        large_dump = self.measure_peak(self.dump)
+        self.assertLess(large_stream, small_stream * 1.5)
+        self.assertLess(large_stream * 5, large_dump)
+
+
+class CodecTestCase(TestCase):
+    def available_codecs(self):
+        for name in codec.BACKENDS:
+            try:
+                yield codec.load_codec(name)
+            except ImportError:
+                pass
+
+    def test_backends_round_trip_to_bytes(self):
+        data = {"id": 1, "title": "Caf\u00e9 / News", "regions": [], "author": None}
+        for backend in self.available_codecs():
+            encoded = backend.dumps(data)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(json.loads(encoded), data)
+            self.assertEqual(backend.loads(encoded), data)
+            self.assertEqual(backend.loads(json.dumps(data).encode()), data)
+
+    def test_auto_falls_back_to_stdlib(self):
+        self.assertIn(codec.load_codec("auto").name, codec.BACKENDS)
+        with override_settings(JSON_CODEC="json"):
+            self.assertEqual(codec.get_codec().name, "json")
+            response = self.client.post(
+                reverse("authors-list"),
+                data=json.dumps({"first_name": "Jane", "last_name": "Doe"}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()["first_name"], "Jane")
+
+    def test_rejects_unknown_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            codec.load_codec("yaml")
+
+
+class SchemaRegistryTestCase(TestCase):
+    def test_schemas_are_built_once(self):
+        self.assertIs(get_schema(ArticleSchema), get_schema(ArticleSchema))
+        self.assertIsNot(
+            get_schema(ArticleSchema), get_schema(ArticleSchema, only=("id",))
+        )
+
+    def test_fast_dump_matches_marshmallow(self):
+        article = f.ArticleFactory()
+        article.regions.set(f.RegionFactory.create_batch(size=2))
+        orphan = f.ArticleFactory(author=None)
+        for schema_class, obj in (
+            (ArticleSchema, article),
+            (ArticleSchema, orphan),
+            (AuthorSchema, article.author),
+            (RegionSchema, article.regions.first()),
+        ):
+            schema = get_schema(schema_class)
+            self.assertEqual(dump(schema, obj), schema_class().dump(obj))
+        self.assertEqual(
+            dump(get_schema(ArticleSchema, only=("id", "author.id")), article),
+            {"id": article.id, "author": {"id": article.author.id}},
+        )
+
+    def test_falls_back_to_marshmallow_for_other_fields_and_hooks(self):
+        class Dated(Schema):
+            id = fields.Integer()
+            name = fields.Function(lambda obj: obj.first_name.upper())
+            nickname = fields.String(attribute="profile.nickname")
+
+        class Hooked(Schema):
+            id = fields.Integer()
+
+            @post_dump
+            def wrap(self, data, **kwargs):
+                return {"wrapped": data}
+
+        author = f.AuthorFactory(first_name="jane")
+        self.assertEqual(
+            dump(get_schema(Dated), author), {"id": author.id, "name": "JANE"}
+        )
+        self.assertEqual(
+            dump(get_schema(Hooked), author), {"wrapped": {"id": author.id}}
+        )
+
+
+@override_settings(API_CACHE="api")
+class ResponseCacheTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        caches["api"].clear()
+        self.article = f.ArticleFactory()
+        self.region = f.RegionFactory()
+        self.article.regions.set([self.region])
+        self.list_url = reverse("articles-list")
+        self.detail_url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_serves_repeated_reads_from_cache(self):
+        for url in (
+            self.list_url,
+            self.detail_url,
+            reverse("authors-list"),
+            reverse("regions-list"),
+        ):
+            first = self.get(url)
+            self.assertEqual(self.count_queries(self.get, url), 0)
+            self.assertEqual(self.get(url), first)
+
+    def test_answers_conditional_requests_from_cache(self):
+        etag = self.client.get(self.detail_url)["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_query_parameters_are_part_of_the_key(self):
+        f.ArticleFactory()
+        self.assertEqual(len(self.get(self.list_url)), 2)
+        self.assertEqual(len(self.get(self.list_url, {"page_size": 1})), 1)
+
+    def test_does_not_cache_errors(self):
+        url = reverse("article", kwargs={"article_id": 0})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.count_queries(self.client.get, url), 1)
+
+    def test_article_writes_invalidate(self):
+        self.get(self.detail_url)
+        self.get(self.list_url)
+        self.client.put(
+            self.detail_url,
+            data=json.dumps({"title": "New", "author_id": self.article.author.id}),
+            content_type="application/json",
+        )
+        self.assertEqual(self.get(self.detail_url)["title"], "New")
+        self.assertEqual(self.get(self.list_url)[0]["title"], "New")
+
+    def test_author_rename_invalidates_nesting_articles(self):
+        other = f.ArticleFactory()
+        other_url = reverse("article", kwargs={"article_id": other.id})
+        self.get(self.detail_url)
+        self.get(self.list_url)
+        self.get(other_url)
+        author = self.article.author
+        author.first_name = "Renamed"
+        author.save()
+        self.assertEqual(self.get(self.detail_url)["author"]["first_name"], "Renamed")
+        self.assertEqual(self.get(self.list_url)[0]["author"]["first_name"], "Renamed")
+        # Articles by other authors are untouched
+        self.assertEqual(self.count_queries(self.get, other_url), 0)
+
+    def test_region_changes_invalidate_nesting_articles(self):
+        self.get(self.detail_url)
+        self.region.name = "Renamed"
+        self.region.save()
+        self.assertEqual(self.get(self.detail_url)["regions"][0]["name"], "Renamed")
+        self.region.articles.clear()
+        self.assertEqual(self.get(self.detail_url)["regions"], [])
+        self.article.regions.add(self.region)
+        self.assertEqual(len(self.get(self.detail_url)["regions"]), 1)
+        self.region.delete()
+        self.assertEqual(self.get(self.detail_url)["regions"], [])
+
+    def test_author_and_region_writes_bump_one_version(self):
+        self.get(self.detail_url)
+        author = self.article.author
+        f.ArticleFactory.create_batch(20, author=author)
+        cache = caches["api"]
+        with mock.patch.object(
+            cache, "set_many", wraps=cache.set_many
+        ) as set_many, CaptureQueriesContext(connection) as context:
+            author.first_name = "Renamed"
+            author.save()
+            self.region.name = "Renamed"
+            self.region.save()
+        self.assertEqual(len(context.captured_queries), 2)
+        for (versions,), _ in set_many.call_args_list:
+            self.assertLessEqual(len(versions), 3)
+        data = self.get(self.detail_url)
+        self.assertEqual(data["author"]["first_name"], "Renamed")
+        self.assertEqual(data["regions"][0]["name"], "Renamed")
+
+    def test_does_not_store_reads_overtaken_by_a_write(self):
+        author = self.article.author
+        view = ArticleView.as_view()
+
+        def rename_while_reading(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            Author.objects.filter(pk=author.pk).update(first_name="Renamed")
+            author.first_name = "Renamed"
+            post_save.send(Author, instance=author, created=False)
+            return response
+
+        request = RequestFactory().get(self.detail_url)
+        cache_response("article:{article_id}")(rename_while_reading)(
+            request, article_id=self.article.id
+        )
+        self.assertEqual(self.get(self.detail_url)["author"]["first_name"], "Renamed")
+
+    def test_bulk_writes_invalidate(self):
+        self.get(self.detail_url)
+        response = self.client.post(
+            reverse("articles-bulk"),
+            data=json.dumps(
+                [
+                    {
+                        "id": self.article.id,
+                        "title": "Bulk",
+                        "author_id": self.article.author.id,
+                    }
+                ]
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get(self.detail_url)["title"], "Bulk")
+
+
+class AsyncViewTestCase(TestCase):
+    def setUp(self):
+        caches["api"].clear()
+        self.factory = AsyncRequestFactory()
+        self.article = f.ArticleFactory()
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def test_views_are_selected_per_url_name(self):
+        self.assertTrue(asyncio.iscoroutinefunction(AsyncArticleView.as_view()))
+        with override_settings(ASYNC_VIEWS=["articles-list"]):
+            pattern = route(
+                "a/", ArticlesListView, AsyncArticlesListView, name="articles-list"
+            )
+            self.assertIs(pattern.callback.view_class, AsyncArticlesListView)
+            pattern = route("b/", ArticlesListView, AsyncArticlesListView, name="b")
+            self.assertIs(pattern.callback.view_class, ArticlesListView)
+
+    def test_middleware_stack_is_async_capable(self):
+        # A single sync only middleware runs the whole stack in a thread
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), "async_capable", False), path)
+
+    async def test_serves_crud_requests(self):
+        view = AsyncArticleView.as_view()
+        response = await view(self.factory.get(self.url), article_id=self.article.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["title"], self.article.title)
+
+        payload = {"title": "Async", "author_id": self.article.author_id}
+        request = self.factory.put(
+            self.url, data=json.dumps(payload), content_type="application/json"
+        )
+        response = await view(request, article_id=self.article.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["title"], "Async")
+
+        response = await view(self.factory.get(self.url), article_id=0)
+        self.assertEqual(response.status_code, 404)
+
+        response = await AsyncArticlesListView.as_view()(self.factory.get("/"))
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    @override_settings(API_CACHE="api")
+    async def test_serves_cached_responses_without_the_database(self):
+        view = AsyncArticleView.as_view()
+        # The author was written without the cache, its version is created by
+        # the first read, too late for that read to be stored
+        for _ in range(2):
+            first = await view(self.factory.get(self.url), article_id=self.article.id)
+        # Queries run on the main thread, the test coroutine does not
+        context = CaptureQueriesContext(connection)
+        await sync_to_async(context.__enter__)()
+        second = await view(self.factory.get(self.url), article_id=self.article.id)
+        await sync_to_async(context.__exit__)(None, None, None)
+        self.assertEqual(await sync_to_async(len)(context), 0)
+        self.assertEqual(second.content, first.content)
+
+    @override_settings(API_CACHE="api")
+    async def test_uses_the_cache_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        calls = []
+        # Cache instances are per thread, their class is shared
+        backend = type(caches["api"])
+
+        def record(name):
+            method = getattr(backend, name)
+
+            def recorded(*args, **kwargs):
+                calls.append((name, threading.get_ident()))
+                return method(*args, **kwargs)
+
+            return mock.patch.object(backend, name, recorded)
+
+        view = AsyncArticleView.as_view()
+        # The view's own lookup, which the async view already made
+        lookup = mock.patch(
+            "techtest.cache.get_cached_response",
+            side_effect=AssertionError("Looked up twice"),
+        )
+        with record("get"), record("get_many"), record("set"), record("set_many"):
+            with lookup:
+                # Misses, then a hit
+                for _ in range(3):
+                    await view(self.factory.get(self.url), article_id=self.article.id)
+        self.assertIn("set", [name for name, _ in calls])
+        self.assertNotIn(loop_thread, [thread for _, thread in calls])
+
+
+class LoaderTestCase(TestCase):
+    def setUp(self):
+        self.authors = [f.AuthorFactory() for _ in range(3)]
+        self.regions = [f.RegionFactory() for _ in range(3)]
+
+    def select_queries(self, context, table):
+        # Lookups of rows of ``table``, not joins through it
+        return [
+            query
+            for query in context.captured_queries
+            if 'FROM "%s" WHERE' % table in query["sql"]
+        ]
+
+    def test_batches_and_memoizes(self):
+        with request_scope():
+            loader = get_loader(Author)
+            self.assertIs(get_loader(Author), loader)
+            loader.prime([author.pk for author in self.authors])
+            with self.assertNumQueries(1):
+                self.assertEqual(loader.load(self.authors[0].pk), self.authors[0])
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    loader.load_many([self.authors[2].pk, self.authors[1].pk]),
+                    {
+                        self.authors[2].pk: self.authors[2],
+                        self.authors[1].pk: self.authors[1],
+                    },
+                )
+            with self.assertNumQueries(1):
+                self.assertIsNone(loader.load(0))
+                self.assertIsNone(loader.load(0))
+        self.assertIsNot(get_loader(Author), get_loader(Author))
+
+    def test_forgets_written_instances(self):
+        author, region = self.authors[0], self.regions[0]
+        with request_scope():
+            get_loader(Author).load(author.pk)
+            get_loader(Region, "code").load(region.code)
+            author.first_name = "Changed"
+            author.save()
+            old_code, region.code = region.code, "ZZ"
+            region.save()
+            self.assertEqual(get_loader(Author).load(author.pk).first_name, "Changed")
+            self.assertIsNone(get_loader(Region, "code").load(old_code))
+            self.assertEqual(get_loader(Region, "code").load("ZZ"), region)
+
+    def test_schema_loads_authors_and_regions_in_one_query(self):
+        payload = [
+            {
+                "title": "Article %s" % i,
+                "author_id": author.pk,
+                "regions": [{"id": region.pk}, {"code": self.regions[i].code}],
+            }
+            for i, (author, region) in enumerate(zip(self.authors, self.regions[::-1]))
+        ]
+        with request_scope(), CaptureQueriesContext(connection) as context:
+            articles = ArticleSchema(many=True).load(payload)
+        self.assertEqual(len(self.select_queries(context, "authors_author")), 1)
+        # One query by id and one by code
+        self.assertEqual(len(self.select_queries(context, "regions_region")), 2)
+        self.assertEqual([article.author for article in articles], self.authors)
+        self.assertEqual(
+            [set(article.regions.all()) for article in articles],
+            [{region, self.regions[i]} for i, region in enumerate(self.regions[::-1])],
+        )
+
+    def test_requests_are_scoped(self):
+        author = self.authors[0]
+        payload = {"title": "Title", "author_id": author.pk}
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(
+                    reverse("articles-list"),
+                    data=json.dumps(payload),
+                    content_type="application/json",
+                )
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(self.select_queries(context, "authors_author")), 1)
+
+    def test_middleware_scopes_async_requests(self):
+        scopes = []
+
+        async def view(request):
+            scopes.append(await sync_to_async(get_loader)(Author))
+            scopes.append(await sync_to_async(get_loader)(Author))
+            return HttpResponse()
+
+        middleware = loader_middleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        asyncio.run(middleware(AsyncRequestFactory().get("/")))
+        # Both threads saw the request's loader
+        self.assertIs(scopes[0], scopes[1])
+
+
+class DatabaseConfigTestCase(TestCase):
+    def test_sqlite_defaults(self):
+        config = database_config({}, "db.sqlite3")
+        self.assertEqual(config["ENGINE"], "techtest.db.sqlite3")
+        self.assertEqual(config["NAME"], "db.sqlite3")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(config["PRAGMAS"]["journal_mode"], "wal")
+        config = database_config({"DATABASE_SQLITE_TUNING": "0"}, "db.sqlite3")
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertNotIn("PRAGMAS", config)
+
+    def test_pooled_postgresql(self):
+        config = database_config(
+            {
+                "DATABASE_ENGINE": "postgresql",
+                "DATABASE_NAME": "techtest",
+                "DATABASE_HOST": "pgbouncer",
+                "DATABASE_POOL": "pgbouncer",
+            },
+            "db.sqlite3",
+        )
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(config["HOST"], "pgbouncer")
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertNotIn("PRAGMAS", config)
+        with self.assertRaises(ImproperlyConfigured):
+            database_config({"DATABASE_POOL": "other"}, "db.sqlite3")
+
+    def test_sqlite_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_unusable_connections_are_closed(self):
+        connection.ensure_connection()
+        with mock.patch.object(connection, "close") as close:
+            with mock.patch.object(connection, "is_usable", return_value=True):
+                check_connections(sender=None)
+            close.assert_not_called()
+            with mock.patch.object(connection, "is_usable", return_value=False):
+                check_connections(sender=None)
+            close.assert_called_once()
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRouterTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.healthy = {"replica1": True, "replica2": True}
+        self.router.health.is_healthy = self.healthy.get
+
+    def reads(self, count=4, in_atomic_block=False):
+        # Tests run in a transaction, which keeps reads on the primary
+        with mock.patch.object(
+            connections["default"], "in_atomic_block", in_atomic_block
+        ):
+            return [self.router.db_for_read(Article) for _ in range(count)]
+
+    def test_round_robin_over_healthy_replicas(self):
+        self.assertEqual(self.reads(), ["replica1", "replica2", "replica1", "replica2"])
+        self.healthy["replica1"] = False
+        self.assertEqual(self.reads(2), ["replica2", "replica2"])
+        self.healthy["replica2"] = False
+        self.assertEqual(self.reads(2), ["default", "default"])
+        self.assertEqual(self.router.db_for_write(Article), "default")
+
+    def test_primary_when_pinned_or_in_a_transaction(self):
+        with use_primary():
+            self.assertEqual(self.reads(2), ["default", "default"])
+        self.assertEqual(self.reads(2, in_atomic_block=True), ["default", "default"])
+
+    def test_failing_replicas_are_ejected(self):
+        health = ReplicaHealth()
+        with mock.patch.object(health, "check", return_value=False) as check:
+            with mock.patch("techtest.db.router.time.monotonic", return_value=100):
+                self.assertFalse(health.is_healthy("replica1"))
+                self.assertFalse(health.is_healthy("replica1"))
+            self.assertEqual(check.call_count, 1)
+            check.return_value = True
+            with mock.patch("techtest.db.router.time.monotonic", return_value=131):
+                self.assertTrue(health.is_healthy("replica1"))
+                self.assertTrue(health.is_healthy("replica1"))
+            self.assertEqual(check.call_count, 2)
+
+    def test_middleware_pins_writes_and_sticks_to_the_client(self):
+        seen = []
+
+        def view(request):
+            seen.append(reads_from_replicas())
+            return HttpResponse()
+
+        async def async_view(request):
+            return await sync_to_async(view)(request)
+
+        factory = RequestFactory()
+        for middleware in (replica_middleware(view), replica_middleware(async_view)):
+            seen.clear()
+            call = middleware
+            if asyncio.iscoroutinefunction(middleware):
+                call = async_to_sync(middleware)
+            call(factory.get("/"))
+            response = call(factory.post("/"))
+            self.assertEqual(response.cookies["use_primary"]["max-age"], 5)
+            request = factory.get("/")
+            request.COOKIES["use_primary"] = "1"
+            call(request)
+            self.assertEqual(seen, [True, False, False])
+
+    @override_settings(API_CACHE="api")
+    def test_fresh_versions_are_not_cached_from_replicas(self):
+        caches["api"].clear()
+        url = reverse("article", kwargs={"article_id": f.ArticleFactory().id})
+        get = lambda **kwargs: self.client.get(url, **kwargs)  # noqa: E731
+        self.assertEqual(self.count_queries(get), self.count_queries(get))
+        self.client.cookies["use_primary"] = "1"
+        get()
+        self.assertEqual(self.count_queries(get), 0)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaFilesTestCase(TransactionTestCase):
+    """
+    Reads against a second SQLite file holding different rows than the
+    primary. Runs outside a test transaction, which would keep every read on
+    the primary.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "replica.sqlite3")
+        # The replica starts with the primary's schema
+        connections["default"].ensure_connection()
+        with contextlib.closing(sqlite3.connect(path)) as replica:
+            connections["default"].connection.backup(replica)
+        connections.settings["replica1"] = dict(
+            connections["default"].settings_dict, NAME=path
+        )
+        self.addCleanup(connections.settings.pop, "replica1")
+        self.addCleanup(connections.__delitem__, "replica1")
+        self.addCleanup(lambda: connections["replica1"].close())
+
+        author = f.AuthorFactory()
+        self.article = f.ArticleFactory(author=author, title="Primary")
+        # Same rows, as replication left them before the latest write
+        Author.objects.using("replica1").bulk_create([author])
+        Article.objects.using("replica1").bulk_create(
+            [Article(id=self.article.id, title="Replica", author_id=author.id)]
+        )
+        self.url = reverse("article", kwargs={"article_id": self.article.id})
+
+    def title(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["title"]
+
+    def test_reads_replica_until_the_client_writes(self):
+        self.assertEqual(self.title(), "Replica")
+        response = self.client.put(
+            self.url,
+            data=json.dumps({"title": "Updated", "author_id": self.article.author_id}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        # The replica hasn't caught up, the writer reads from the primary
+        self.assertEqual(self.title(), "Updated")
+        # Other clients still read the replica
+        del self.client.cookies["use_primary"]
+        self.assertEqual(self.title(), "Replica")
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_SAMPLES=10)
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.addCleanup(metrics.registry.clear)
+
+    def summary(self, name, view):
+        return metrics.registry.summaries[name, view]
+
+    def test_records_requests_by_url_name(self):
+        author = f.AuthorFactory()
+        f.ArticleFactory.create_batch(3, author=author)
+        response = self.client.get(reverse("articles-list"))
+        self.client.get(reverse("articles-list"))
+        self.client.get("/missing/")
+
+        self.assertEqual(
+            self.summary("request_duration_seconds", "articles-list").count, 2
+        )
+        self.assertEqual(
+            self.summary("response_size_bytes", "articles-list").sum,
+            2 * len(response.content),
+        )
+        queries = self.summary("sql_queries", "articles-list")
+        self.assertGreater(queries.sum, 0)
+        self.assertEqual(self.summary("sql_duplicate_queries", "articles-list").sum, 0)
+        self.assertGreater(
+            self.summary("serialization_duration_seconds", "articles-list").sum, 0
+        )
+        self.assertEqual(self.summary("request_duration_seconds", "unmatched").count, 1)
+
+    def test_counts_duplicate_queries(self):
+        author = f.AuthorFactory()
+
+        def view(request):
+            for _ in range(3):
+                Author.objects.get(pk=author.pk)
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.resolver_match = mock.Mock(url_name="authors")
+        metrics.metrics_middleware(view)(request)
+        self.assertEqual(self.summary("sql_queries", "authors").sum, 3)
+        self.assertEqual(self.summary("sql_duplicate_queries", "authors").sum, 2)
+
+    def test_leaves_out_connection_setup(self):
+        def view(request):
+            # What a connection (re)opening during the request sends, with a
+            # pragma that can be set inside the test case's transaction
+            pragmas = {"PRAGMAS": {"busy_timeout": 5000}}
+            with mock.patch.dict(connection.settings_dict, pragmas):
+                connection_created.send(sender=type(connection), connection=connection)
+            Author.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.resolver_match = mock.Mock(url_name="authors")
+        metrics.metrics_middleware(view)(request)
+        self.assertEqual(self.summary("sql_queries", "authors").sum, 1)
+
+    def test_profiles_concurrent_async_requests_apart(self):
+        def query():
+            # A connection of its own, opened (and set up) in a worker thread.
+            # No table: the test case's transaction locks them to others.
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            finally:
+                connection.close()
+
+        async def view(request):
+            count = int(request.GET["queries"])
+            for _ in range(count):
+                await sync_to_async(query, thread_sensitive=False)()
+                # Interleaves the two requests' queries
+                await asyncio.sleep(0)
+            return HttpResponse()
+
+        middleware = metrics.metrics_middleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        async def requests():
+            calls = []
+            for name, queries in (("one", 1), ("three", 3)):
+                request = AsyncRequestFactory().get("/?queries=%s" % queries)
+                request.resolver_match = mock.Mock(url_name=name)
+                calls.append(middleware(request))
+            await asyncio.gather(*calls)
+
+        async_to_sync(requests)()
+        self.assertEqual(self.summary("sql_queries", "one").sum, 1)
+        self.assertEqual(self.summary("sql_queries", "three").sum, 3)
+
+    def test_renders_prometheus_summaries(self):
+        for value in range(1, 21):
+            metrics.registry.record("article", {"sql_queries": value})
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response["Content-Type"].split(";")[0], "text/plain")
+        body = response.content.decode()
+        self.assertIn("# TYPE techtest_sql_queries summary", body)
+        # Quantiles cover the last METRICS_SAMPLES values, sum and count all
+        self.assertIn('techtest_sql_queries{view="article",quantile="0.5"} 16', body)
+        self.assertIn('techtest_sql_queries{view="article",quantile="0.99"} 20', body)
+        self.assertIn('techtest_sql_queries_sum{view="article"} 210', body)
+        self.assertIn('techtest_sql_queries_count{view="article"} 20', body)
+        # The metrics endpoint doesn't record itself
+        self.assertNotIn('view="metrics"', metrics.registry.render())
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        self.client.get(reverse("articles-list"))
+        self.assertEqual(metrics.registry.summaries, {})
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
@@ -13,19 +13,72 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
-from techtest.articles.views import ArticlesListView, ArticleView
-from techtest.authors.views import AuthorsListView, AuthorView
-from techtest.regions.views import RegionsListView, RegionView
+from techtest import metrics
+from techtest.articles import views as articles
+from techtest.authors import views as authors
+from techtest.regions import views as regions
+
+
+def route(pattern, view, async_view, name):
+    # URL names listed in ASYNC_VIEWS are served by the async view
+    if name in settings.ASYNC_VIEWS:
+        view = async_view
+    return path(pattern, view.as_view(), name=name)
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("articles/", ArticlesListView.as_view(), name="articles-list"),
-    path("articles/<int:article_id>/", ArticleView.as_view(), name="article"),
-    path("regions/", RegionsListView.as_view(), name="regions-list"),
-    path("regions/<int:region_id>/", RegionView.as_view(), name="region"),
-    path("authors/", AuthorsListView.as_view(), name="authors-list"),
-    path("authors/<int:author_id>/", AuthorView.as_view(), name="author"),
+    path("metrics/", metrics.metrics_view, name="metrics"),
+    route(
+        "articles/",
+        articles.ArticlesListView,
+        articles.AsyncArticlesListView,
+        name="articles-list",
+    ),
+    path(
+        "articles/search/", articles.ArticleSearchView.as_view(), name="articles-search"
+    ),
+    path(
+        "articles/export/", articles.ArticleExportView.as_view(), name="articles-export"
+    ),
+    path("articles/bulk/", articles.ArticlesBulkView.as_view(), name="articles-bulk"),
+    route(
+        "articles/<int:article_id>/",
+        articles.ArticleView,
+        articles.AsyncArticleView,
+        name="article",
+    ),
+    route(
+        "regions/",
+        regions.RegionsListView,
+        regions.AsyncRegionsListView,
+        name="regions-list",
+    ),
+    route(
+        "regions/<int:region_id>/",
+        regions.RegionView,
+        regions.AsyncRegionView,
+        name="region",
+    ),
+    path(
+        "regions/<str:region_code>/",
+        regions.RegionCodeView.as_view(),
+        name="region-code",
+    ),
+    route(
+        "authors/",
+        authors.AuthorsListView,
+        authors.AsyncAuthorsListView,
+        name="authors-list",
+    ),
+    route(
+        "authors/<int:author_id>/",
+        authors.AuthorView,
+        authors.AsyncAuthorView,
+        name="author",
+    ),
 ]
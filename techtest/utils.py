@@ -1,9 +1,238 @@
-import json
+import functools
+import hashlib
+import zlib
 
-from django.http.response import HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from django.http.response import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import classonlymethod
+from django.utils.http import http_date
 
+from techtest import codec, metrics
+from techtest.articles.models import TableVersion
+from techtest.cache import get_cached_response
+from techtest.schemas import dump
 
-def json_response(data={}, status=200):
+
+def json_response(data={}, status=200, headers=None):
+    with metrics.serialization():
+        content = codec.dumps(data)
     return HttpResponse(
-        content=json.dumps(data), status=status, content_type="application/json"
+        content=content,
+        status=status,
+        content_type="application/json",
+        headers=headers,
     )
+
+
+def stream_json_response(queryset, schema, chunk_size=None):
+    return StreamingHttpResponse(
+        iter_json_array(queryset, schema, chunk_size),
+        content_type="application/json",
+    )
+
+
+def iter_json_array(queryset, schema, chunk_size=None):
+    # Only one chunk of instances and its encoded output are alive at a time
+    yield b"["
+    separator = b""
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield separator + b",".join(codec.dumps(dump(schema, obj)) for obj in chunk)
+        separator = b","
+    yield b"]"
+
+
+def iter_ndjson(queryset, schema, chunk_size=None):
+    # One JSON document per line, a chunk of lines at a time
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield b"".join(codec.dumps(dump(schema, obj)) + b"\n" for obj in chunk)
+
+
+def iter_gzip(chunks):
+    """Gzips a stream on the fly, each chunk flushed so it can be read as it comes."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def iter_chunks(queryset, chunk_size=None):
+    chunk_size = chunk_size or settings.STREAMING_CHUNK_SIZE
+    if not queryset._prefetch_related_lookups:
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    # QuerySet.iterator() ignores prefetch_related, walk the table in pk
+    # ranges instead so each chunk gets its relations prefetched in bulk.
+    queryset = queryset.order_by("pk")
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        last_pk = chunk[-1].pk
+        # Prefetched querysets keep a reference back to their instance, break
+        # the cycle so a chunk is freed right away rather than on the next gc.
+        for obj in chunk:
+            obj.__dict__.pop("_prefetched_objects_cache", None)
+        if len(chunk) < chunk_size:
+            break
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+
+
+def _column(model, name, field):
+    # The concrete column ``field`` dumps from, None if it isn't a plain column.
+    try:
+        model_field = model._meta.get_field(field.attribute or name)
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.is_relation:
+        return None
+    return model_field.name
+
+
+def _columns(model, schema):
+    # Every column ``schema`` dumps, None when one of its fields needs more.
+    columns = {model._meta.pk.name}
+    for name, field in schema.dump_fields.items():
+        column = _column(model, name, field)
+        if column is None:
+            return None
+        columns.add(column)
+    return columns
+
+
+def optimize_queryset(queryset, schema, only=True):
+    # Schemas declare which of their fields are backed by relations in
+    # ``Meta.select_related`` / ``Meta.prefetch_related`` (field name -> lookup),
+    # so only the relations that will actually be dumped get loaded, and with
+    # ``only`` only the columns that will be dumped get selected. Views that go
+    # on to read or save other columns pass ``only=False``. With SNAPSHOTS on,
+    # fields in ``Meta.snapshots`` are read from their snapshot column instead
+    # of their relation, unless the view needs the relations (``only=False``).
+    meta = schema.Meta
+    model = queryset.model
+    select_related = getattr(meta, "select_related", {})
+    prefetch_related = getattr(meta, "prefetch_related", {})
+    snapshots = getattr(meta, "snapshots", {}) if settings.SNAPSHOTS and only else {}
+    columns = {model._meta.pk.name} if only else None
+    for name, field in schema.dump_fields.items():
+        if name in snapshots:
+            columns.add(snapshots[name])
+            if name in select_related:
+                # A null foreign key has a null snapshot, read without a query
+                columns.add(select_related[name])
+        elif name in select_related:
+            lookup = select_related[name]
+            queryset = queryset.select_related(lookup)
+            related = _columns(
+                model._meta.get_field(lookup).related_model, field.schema
+            )
+            if related is None:
+                columns = None
+            elif columns is not None:
+                columns.add(lookup)
+                columns.update("%s__%s" % (lookup, column) for column in related)
+        elif name in prefetch_related:
+            queryset = queryset.prefetch_related(prefetch_related[name])
+        elif columns is not None:
+            column = _column(model, name, field)
+            columns = None if column is None else columns | {column}
+    if columns is not None:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def table_validators(request, *models):
+    """
+    ETag of a list over ``models``: changes whenever any of their rows is
+    written, added or deleted, or the query changes. Reads the max
+    ``updated_at`` (an index lookup) and ``TableVersion``, bumped by deletes,
+    of every table in a single query.
+    """
+    quote = connection.ops.quote_name
+    versions = TableVersion._meta
+    columns, params = [], []
+    for model in models:
+        table = model._meta.db_table
+        columns += [
+            "(SELECT MAX(%s) FROM %s)" % (quote("updated_at"), quote(table)),
+            "(SELECT %s FROM %s WHERE %s = %%s)"
+            % (
+                quote(versions.get_field("version").column),
+                quote(versions.db_table),
+                quote(versions.get_field("table").column),
+            ),
+        ]
+        params.append(table)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT %s" % ", ".join(columns), params)
+        state = cursor.fetchone()
+    return make_etag(request.get_full_path(), *state), None
+
+
+def conditional(method):
+    """
+    Answers If-None-Match / If-Modified-Since with a 304 and If-Match /
+    If-Unmodified-Since with a 412 from the view's ``get_validators()``,
+    before running the handler.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+        if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+            response["ETag"] = etag
+            if timestamp:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    return wrapper
+
+
+class AsyncViewMixin:
+    """
+    Serves a class based view as a coroutine under ASGI. Django 3.2 has no
+    async ORM, so the synchronous view runs through ``sync_to_async``. The
+    response cache is looked up in a thread of its own first, cache clients
+    block on the network: hits don't wait for the thread running the views'
+    queries and never block the event loop.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return functools.update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        dispatch = super().dispatch
+        dependencies = getattr(dispatch, "cache_dependencies", None)
+        if dependencies is not None:
+            key, response = await sync_to_async(
+                get_cached_response, thread_sensitive=False
+            )(request, dependencies, kwargs)
+            if response is not None:
+                return response
+            # The view stores the response without looking it up again
+            request.cache_lookup = key, None
+        return await sync_to_async(dispatch)(request, *args, **kwargs)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "techtest.settings")
 
 application = get_wsgi_application()
+
+# Imports models, so only once the application is set up
+from techtest.regions.cache import warm_up  # noqa: E402
+
+warm_up()